@@ -0,0 +1,102 @@
+"""
+Loads the same random tasks into every storage backend and checks that
+get_tasks() and count_tasks() agree on a set of filters, missing (None)
+values and archived tasks included.
+
+Run with: python backend_parity.py --tasks 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+from in_memory_storage import InMemoryStorage
+from sqlite_storage import SQLiteStorage
+from storage_interface import AnyOf, project_subtree
+
+STATES = ["inbox", "active", "maybe", "completed"]
+SCHEDULES = [None, "today", "week", "month", "maybe"]
+PROJECTS = ["default", "work", "work/clientA", "home"]
+RECURRENCES = [None, None, "daily", "weekly:mon,fri", "monthly"]
+
+
+def load(storages, count: int, rng: random.Random, today: date):
+    """Apply the same adds, completions and deletions to every backend"""
+    for i in range(count):
+        data = {
+            "title": f"task {i}",
+            "state": rng.choice(STATES),
+            "schedule": rng.choice(SCHEDULES),
+            "recurrence": rng.choice(RECURRENCES),
+            "project": rng.choice(PROJECTS),
+            "due_date": rng.choice([None, today + timedelta(days=rng.randint(-10, 10))]),
+        }
+        completed_at = datetime.now() - timedelta(days=rng.randrange(60)) if data["state"] == "completed" else None
+        doomed = rng.random() < 0.1
+        for storage in storages:
+            task = storage.add_task(data)
+            if completed_at:
+                storage.update_task(task.id, {"completed_at": completed_at})
+            if doomed:
+                storage.delete_task(task.id)
+    for storage in storages:
+        storage.archive_completed_tasks(datetime.now() - timedelta(days=30), batch_size=count)
+
+
+def cases(today: date):
+    """(OR groups, filters) pairs; built fresh per call since some filters are one-shot generators"""
+    return [
+        ((), {}),
+        ((), {"schedule__ne": "week"}),
+        ((), {"schedule__ne": None}),
+        ((), {"due_date__ne": today}),
+        ((), {"due_date": None}),
+        ((), {"due_date__in": [today, None]}),
+        ((), {"schedule__in": (s for s in ["week", None])}),
+        ((), {"due_date__lt": today, "state__ne": "completed"}),
+        ((), {"due_date__gte": today}),
+        ((), {"recurrence__isnull": False}),
+        ((), {"state": "completed"}),
+        ((), {"state__in": ["completed", "maybe"], "schedule__ne": "today"}),
+        ((), {"project__startswith": "work"}),
+        ((project_subtree("work"),), {"state__ne": "completed"}),
+        ((AnyOf({"state": "active"}, {"due_date__isnull": False}),), {"schedule__ne": "month"}),
+    ]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    today = date.today()
+    with tempfile.TemporaryDirectory() as workdir:
+        storages = [SQLiteStorage(os.path.join(workdir, "parity.db")), InMemoryStorage()]
+        try:
+            from columnar_storage import ColumnarStorage  # Needs numpy
+            storages.append(ColumnarStorage())
+        except ImportError:
+            print("numpy not installed, skipping ColumnarStorage")
+        load(storages, args.tasks, random.Random(args.seed), today)
+
+        mismatches = 0
+        for i in range(len(cases(today))):
+            ids, counts = set(), {}
+            for storage in storages:
+                any_of, filters = cases(today)[i]
+                found = sorted(task.id for task in storage.get_tasks(*any_of, **filters))
+                any_of, filters = cases(today)[i]
+                counts[type(storage).__name__] = (len(found), storage.count_tasks(*any_of, **filters))
+                ids.add(tuple(found))
+            agree = len(ids) == 1 and all(found == counted for found, counted in counts.values())
+            mismatches += not agree
+            print(f"{'ok  ' if agree else 'DIFF'} {cases(today)[i][1]} {counts}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
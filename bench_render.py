@@ -0,0 +1,50 @@
+"""
+Compares per-render cost of the FT builders (FT tree + to_xml) with the
+precompiled templates used by the routes, for the sidebar, a task row and
+the edit form. Run with: python bench_render.py
+"""
+import os
+import re
+import timeit
+from datetime import date, datetime
+
+from fasthtml.common import to_xml
+
+# main builds its storage on import; keep that off ./gtd.db
+os.environ["GTD_STORAGE"] = "memory"
+import main
+from storage_interface import Task
+
+# Templates splice pre-serialized fragments, so only indentation differs
+_BETWEEN_TAGS = re.compile(r">\s+<")
+
+
+def _same_markup(a: str, b: str) -> bool:
+    return _BETWEEN_TAGS.sub("><", a.strip()) == _BETWEEN_TAGS.sub("><", b.strip())
+
+
+def bench(name: str, before, after, number: int = 2000):
+    assert _same_markup(before(), after()), f"{name}: template output differs from FT output"
+    t_before = min(timeit.repeat(before, number=number, repeat=3)) / number * 1e6
+    t_after = min(timeit.repeat(after, number=number, repeat=3)) / number * 1e6
+    print(f"{name:<12} FT+to_xml {t_before:8.1f} us   template {t_after:8.1f} us   {t_before / t_after:5.1f}x")
+
+
+if __name__ == "__main__":
+    sidebar_args = dict(
+        current_view="today", inbox_count=12, today_count=3, active_count=0, maybe_count=7,
+        projects=[{"name": f"project-{i}", "count": i} for i in range(8)],
+    )
+    open_task = Task(id=42, title="Write <quarterly> report & send", project="work",
+                     due_date=date.today(), schedule="today", state="active")
+    done_task = Task(id=43, title="File taxes", project="default", state="completed",
+                     completed_at=datetime.now())
+
+    bench("sidebar", lambda: to_xml(main.render_sidebar_ft(**sidebar_args)),
+          lambda: main.render_sidebar(**sidebar_args))
+    bench("task row", lambda: to_xml(main.render_task_item_ft(open_task)),
+          lambda: main.render_task_item(open_task))
+    bench("done row", lambda: to_xml(main.render_task_item_ft(done_task)),
+          lambda: main.render_task_item(done_task))
+    bench("edit form", lambda: to_xml(main.render_edit_form_ft(open_task)),
+          lambda: main.render_edit_form(open_task))
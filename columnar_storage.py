@@ -0,0 +1,377 @@
+from storage_interface import (
+    IStorage, Task, DailyStat, AnyOf, SEED_TASKS, COMPARISON_OPERATORS, parse_filter, value_predicate, wants_archived, materialize_filters, task_path,
+)
+from analytics import stat_deltas, apply_deltas, backfill
+from memory_diagnostics import deep_sizeof
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from datetime import datetime, date
+import threading
+
+import numpy as np
+
+_NAT = np.datetime64("NaT")
+
+
+class _Interner:
+    """Maps repeated strings (states, projects, schedules) to small integer codes"""
+
+    def __init__(self, values=()):
+        self.codes: Dict[Optional[str], int] = {}
+        self.values: List[Optional[str]] = []
+        for value in values:
+            self.code(value)
+
+    def code(self, value: Optional[str]) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup_table(self, test: Callable[[Optional[str]], bool]) -> np.ndarray:
+        """Evaluate `test` once per distinct value; index the result with a code column"""
+        return np.fromiter((test(value) for value in self.values), dtype=bool, count=len(self.values))
+
+
+class ColumnarStorage(IStorage):
+    """
+    In-memory storage that keeps each task field in its own NumPy array
+    (one row per task, in insertion order) instead of a dict of Task objects.
+    States, schedules, projects and recurrence rules are interned integer codes,
+    so filters and counts are vectorized masks and bincounts.
+
+    Deleted rows stay as change-log tombstones and are reclaimed once past
+    the retention horizon. Every method holds a lock, since requests call
+    storage from worker threads and a write can swap the arrays.
+    """
+
+    _CODED = ("state", "schedule", "project", "recurrence")
+    _DATES = ("due_date",)
+    _DATETIMES = ("completed_at", "created_at", "updated_at")
+    _ARRAYS = ("_id", "_alive", "_archived", "_version", "_state", "_schedule", "_project",
+               "_recurrence", "_due_date", "_completed_at", "_created_at", "_updated_at")
+    _LISTS = ("_title", "_description", "_parent_id", "_path")
+
+    def __init__(self, capacity: int = 1024, today: Callable[[], date] = date.today):
+        self._today = today  # The day rollup inbox counts go to
+        self._lock = threading.RLock()  # Re-entrant: add_task looks up the parent, update_many calls update_task
+        self._size = 0
+        self._capacity = capacity
+        self._id = np.zeros(capacity, dtype=np.int64)
+        self._alive = np.zeros(capacity, dtype=bool)  # False once deleted (tombstone)
+        self._archived = np.zeros(capacity, dtype=bool)
+        self._version = np.zeros(capacity, dtype=np.int64)  # Change-log version per row
+        # Codes are as wide as project codes: states and schedules come from form input too
+        self._state = np.zeros(capacity, dtype=np.int32)
+        self._schedule = np.zeros(capacity, dtype=np.int32)
+        self._project = np.zeros(capacity, dtype=np.int32)
+        self._recurrence = np.zeros(capacity, dtype=np.int32)
+        self._due_date = np.full(capacity, _NAT, dtype="datetime64[D]")
+        self._completed_at = np.full(capacity, _NAT, dtype="datetime64[us]")
+        self._created_at = np.full(capacity, _NAT, dtype="datetime64[us]")
+        self._updated_at = np.full(capacity, _NAT, dtype="datetime64[us]")
+        self._title: List[str] = []
+        self._description: List[Optional[str]] = []
+        self._parent_id: List[Optional[int]] = []
+        self._path: List[str] = []
+        self._rows: Dict[int, int] = {}  # id -> row, for tasks not deleted
+        self._next_id = 1
+        self._states = _Interner(["inbox", "active", "maybe", "completed"])
+        self._schedules = _Interner([None, "today", "week", "month", "maybe"])
+        self._projects = _Interner(["default"])
+        self._recurrences = _Interner([None])
+        self._current_version = 0
+        self._stats: Dict[Tuple[date, str], Dict[str, float]] = {}  # Daily rollups
+        self._seed_data()
+
+    def _seed_data(self):
+        for task_data in SEED_TASKS:
+            self.add_task(task_data)
+
+    # --- Row storage ---
+
+    def _make_room(self):
+        """
+        Called with every row in use. Reclaims deleted rows whose tombstone
+        is past the change-log horizon; if that frees less than half the
+        rows, doubles the capacity instead.
+        """
+        n = self._size
+        keep = self._alive[:n] | (self._version[:n] > self.get_change_horizon())
+        if np.count_nonzero(keep) <= n // 2:
+            self._reallocate(self._capacity, np.flatnonzero(keep))
+        else:
+            self._reallocate(self._capacity * 2, np.arange(n))
+
+    def _reallocate(self, capacity: int, rows: np.ndarray):
+        """Move `rows` (in order) into fresh columns of `capacity` rows"""
+        for name in self._ARRAYS:
+            old = getattr(self, name)
+            new = np.full(capacity, _NAT if old.dtype.kind == "M" else 0, dtype=old.dtype)
+            new[:len(rows)] = old[rows]
+            setattr(self, name, new)
+        if len(rows) < self._size:
+            for name in self._LISTS:
+                column = getattr(self, name)
+                setattr(self, name, [column[row] for row in rows])
+            self._rows = {int(task_id): row for row, task_id in enumerate(self._id[:len(rows)]) if self._alive[row]}
+        self._size = len(rows)
+        self._capacity = capacity
+
+    def _interner(self, field: str) -> _Interner:
+        return {"state": self._states, "schedule": self._schedules, "project": self._projects,
+                "recurrence": self._recurrences}[field]
+
+    def _write_row(self, row: int, task: Task):
+        # Convert everything first, so a value that fails leaves the row untouched
+        codes = {field: self._interner(field).code(getattr(task, field)) for field in self._CODED}
+        due_date = _NAT if task.due_date is None else np.datetime64(task.due_date, "D")
+        datetimes = {field: _NAT if (value := getattr(task, field)) is None else np.datetime64(value, "us")
+                     for field in self._DATETIMES}
+        for field, code in codes.items():
+            getattr(self, f"_{field}")[row] = code
+        self._due_date[row] = due_date
+        for field, value in datetimes.items():
+            getattr(self, f"_{field}")[row] = value
+        self._title[row] = task.title
+        self._description[row] = task.description
+        self._parent_id[row] = task.parent_id
+        self._path[row] = task.path
+
+    def _read_row(self, row: int) -> Task:
+        return Task(
+            id=int(self._id[row]),
+            title=self._title[row],
+            description=self._description[row],
+            state=self._states.values[self._state[row]],
+            schedule=self._schedules.values[self._schedule[row]],
+            recurrence=self._recurrences.values[self._recurrence[row]],
+            due_date=self._due_date[row].item(),  # NaT -> None
+            project=self._projects.values[self._project[row]],
+            parent_id=self._parent_id[row],
+            path=self._path[row],
+            completed_at=self._completed_at[row].item(),
+            created_at=self._created_at[row].item(),
+            updated_at=self._updated_at[row].item(),
+        )
+
+    def _log_change(self, row: int):
+        self._current_version += 1
+        self._version[row] = self._current_version
+
+    def _row(self, task_id: int) -> Optional[int]:
+        return self._rows.get(task_id)
+
+    # --- Vectorized filtering ---
+
+    def _condition_mask(self, key: str, value: Any) -> np.ndarray:
+        field, op = parse_filter(key)
+        n = self._size
+        if field in self._CODED:
+            # One test per distinct value, then a gather by code
+            column = getattr(self, f"_{field}")[:n]
+            return self._interner(field).lookup_table(value_predicate(op, value))[column]
+        if field in self._DATES or field in self._DATETIMES:
+            unit = "D" if field in self._DATES else "us"
+            return self._datetime_mask(getattr(self, f"_{field}")[:n], unit, op, value)
+        if field == "id":
+            return self._compare(self._id[:n], op, value)
+        # Free-text columns (and the subtask links) stay Python objects
+        test = value_predicate(op, value)
+        column = getattr(self, f"_{field}")
+        return np.fromiter((test(v) for v in column[:n]), dtype=bool, count=n)
+
+    def _datetime_mask(self, column: np.ndarray, unit: str, op: str, value: Any) -> np.ndarray:
+        missing = np.isnat(column)
+        if op == "isnull":
+            return missing if value else ~missing
+        if op == "in":
+            values = [v for v in value if v is not None]
+            mask = np.isin(column, np.array(values, dtype=f"datetime64[{unit}]"))
+            return mask | missing if None in value else mask
+        if value is None:
+            return missing if op == "eq" else ~missing
+        return self._compare(column, op, np.datetime64(value, unit))
+
+    @staticmethod
+    def _compare(column: np.ndarray, op: str, value: Any) -> np.ndarray:
+        if op == "in":
+            return np.isin(column, list(value))
+        if op == "isnull":
+            return np.full(len(column), not value)
+        # NaT compares False for everything but !=, matching None semantics
+        return COMPARISON_OPERATORS[op](column, value)
+
+    def _mask(self, filters: Dict[str, Any], any_of: Tuple[AnyOf, ...] = ()) -> np.ndarray:
+        filters = materialize_filters(filters)
+        mask = self._alive[:self._size].copy()
+        if not wants_archived(filters, any_of):
+            mask &= ~self._archived[:self._size]
+        for key, value in filters.items():
+            mask &= self._condition_mask(key, value)
+        for group in any_of:
+            group_mask = np.zeros(self._size, dtype=bool)
+            for alt in group.alternatives:
+                alt_mask = np.ones(self._size, dtype=bool)
+                for key, value in alt.items():
+                    alt_mask &= self._condition_mask(key, value)
+                group_mask |= alt_mask
+            mask &= group_mask
+        return mask
+
+    def _open_mask(self) -> np.ndarray:
+        n = self._size
+        return self._alive[:n] & ~self._archived[:n] & (self._state[:n] != self._states.code("completed"))
+
+    # --- IStorage ---
+
+    def get_tasks(self, *any_of: AnyOf, **filters: Any) -> List[Task]:
+        with self._lock:
+            return [self._read_row(row) for row in np.flatnonzero(self._mask(filters, any_of))]
+
+    def count_tasks(self, *any_of: AnyOf, **filters: Any) -> int:
+        with self._lock:
+            return int(np.count_nonzero(self._mask(filters, any_of)))
+
+    def count_open_tasks_by_project(self) -> Dict[str, int]:
+        with self._lock:
+            counts = np.bincount(self._project[:self._size][self._open_mask()], minlength=len(self._projects.values))
+            return {self._projects.values[code]: int(counts[code]) for code in np.flatnonzero(counts)}
+
+    def add_task(self, task_data: Dict[str, Any]) -> Task:
+        with self._lock:
+            parent = None
+            if task_data.get("parent_id") is not None:
+                parent = self.get_task_by_id(task_data["parent_id"])
+                if parent is None:
+                    raise ValueError(f"Unknown parent task: {task_data['parent_id']}")
+            task_id = self._next_id
+
+            now = datetime.now()
+            # Validate with Pydantic model
+            new_task = Task(
+                id=task_id,
+                title=task_data.get("title", "Untitled Task"),
+                description=task_data.get("description"),
+                state=task_data.get("state", "inbox"),
+                schedule=task_data.get("schedule"),
+                recurrence=task_data.get("recurrence"),
+                due_date=task_data.get("due_date"),
+                project=task_data.get("project", "default"),
+                parent_id=parent.id if parent else None,
+                path=task_path(task_id, parent),
+                completed_at=None,
+                created_at=now,
+                updated_at=now,
+            )
+            if self._size == self._capacity:
+                self._make_room()
+            row = self._size
+            self._title.append("")
+            self._description.append(None)
+            self._parent_id.append(None)
+            self._path.append("")
+            self._write_row(row, new_task)
+            self._size += 1
+            self._next_id += 1
+            self._id[row] = task_id
+            self._alive[row] = True
+            self._rows[task_id] = row
+            self._log_change(row)
+            apply_deltas(self._stats, stat_deltas(None, new_task, self._today()))
+            return new_task
+
+    def get_task_by_id(self, task_id: int) -> Optional[Task]:
+        with self._lock:
+            row = self._row(task_id)
+            return None if row is None else self._read_row(row)
+
+    def update_task(self, task_id: int, update_data: Dict[str, Any]) -> Optional[Task]:
+        with self._lock:
+            row = self._row(task_id)
+            if row is None:
+                return None
+            task = self._read_row(row)
+            updated_fields = task.model_dump()
+            for key, value in update_data.items():
+                if key in updated_fields and key not in ["id", "created_at", "parent_id", "path"]:
+                    updated_fields[key] = value
+            updated_fields["updated_at"] = datetime.now()
+
+            updated_task = Task(**updated_fields)
+            self._write_row(row, updated_task)
+            if updated_task.state != "completed":
+                self._archived[row] = False  # Reopened tasks move back into the working set
+            self._log_change(row)
+            apply_deltas(self._stats, stat_deltas(task, updated_task, self._today()))
+            return updated_task
+
+    def update_many(self, updates: Dict[int, Dict[str, Any]]) -> int:
+        with self._lock:
+            return super().update_many(updates)
+
+    def delete_task(self, task_id: int) -> bool:
+        with self._lock:
+            row = self._row(task_id)
+            if row is None:
+                return False
+            apply_deltas(self._stats, stat_deltas(self._read_row(row), None, self._today()))
+            self._alive[row] = False
+            del self._rows[task_id]
+            # Release the Python objects; the row stays as a tombstone until reclaimed
+            self._title[row] = ""
+            self._description[row] = None
+            self._parent_id[row] = None
+            self._path[row] = ""
+            self._log_change(row)
+            return True
+
+    def get_projects(self) -> List[str]:
+        with self._lock:
+            n = self._size
+            counts = np.bincount(self._project[:n][self._alive[:n] & ~self._archived[:n]], minlength=len(self._projects.values))
+            return sorted(self._projects.values[code] for code in np.flatnonzero(counts) if self._projects.values[code] != "default")
+
+    def archive_completed_tasks(self, completed_before: datetime, batch_size: int = 500) -> int:
+        with self._lock:
+            n = self._size
+            due = (
+                self._alive[:n] & ~self._archived[:n]
+                & (self._state[:n] == self._states.code("completed"))
+                & (self._completed_at[:n] < np.datetime64(completed_before, "us"))
+            )
+            batch = np.flatnonzero(due)[:batch_size]
+            self._archived[batch] = True
+            return len(batch)
+
+    def get_daily_stats(self, start: date, end: date) -> List[DailyStat]:
+        with self._lock:
+            return [
+                DailyStat(day=day, project=project, **fields)
+                for (day, project), fields in self._stats.items() if start <= day <= end
+            ]
+
+    def rebuild_daily_stats(self) -> int:
+        with self._lock:
+            rows = np.flatnonzero(self._alive[:self._size])
+            self._stats = backfill(self._read_row(row) for row in rows)
+            return len(self._stats)
+
+    def memory_footprint(self) -> Dict[str, int]:
+        with self._lock:
+            arrays = sum(v.nbytes for v in vars(self).values() if isinstance(v, np.ndarray))
+            objects = deep_sizeof([self._title, self._description, self._parent_id, self._path, self._rows, self._stats,
+                                   self._states.values, self._schedules.values, self._projects.values,
+                                   self._recurrences.values])
+            return {"tasks": len(self._rows), "bytes": arrays + objects}
+
+    def get_version(self) -> int:
+        return self._current_version
+
+    def get_changes(self, since: int = 0) -> Tuple[int, List[Task], List[int]]:
+        with self._lock:
+            rows = np.flatnonzero(self._version[:self._size] > since)
+            alive = self._alive[rows]
+            tasks = [self._read_row(row) for row in rows[alive]]
+            deleted = [int(task_id) for task_id in self._id[rows[~alive]]]
+            return self._current_version, tasks, deleted
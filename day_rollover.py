@@ -0,0 +1,64 @@
+import calendar
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from recurrence import first_occurrence
+from storage_interface import IStorage
+
+# Schedules whose due date is relative to the current day and moves with it
+ROLLING_SCHEDULES = ("week", "month")
+
+
+def schedule_due_date(schedule: Optional[str], today: date) -> Optional[date]:
+    """Due date for an edit-form schedule as of `today`"""
+    if schedule == "today":
+        return today
+    if schedule == "week":
+        # This week's Friday (weekday 4), or next week's once it has passed
+        return today + timedelta(days=(4 - today.weekday() + 7) % 7)
+    if schedule == "month":
+        return date(today.year, today.month, calendar.monthrange(today.year, today.month)[1])
+    return None
+
+
+class DayClock:
+    """
+    The current day as the app sees it. Request paths read `today` instead
+    of calling date.today() per row; the rollover job advances it, so
+    everything date-dependent changes over together at the day boundary.
+    """
+
+    def __init__(self, today: Callable[[], date] = date.today):
+        self._source = today
+        self.today = today()
+
+    def advance(self) -> bool:
+        """Move to the real current day; True if it changed"""
+        today = self._source()
+        if today == self.today:
+            return False
+        self.today = today
+        return True
+
+    def seconds_until_tomorrow(self) -> float:
+        midnight = datetime.combine(self._source() + timedelta(days=1), datetime.min.time())
+        return max((midnight - datetime.now()).total_seconds(), 0.0)
+
+
+def plan_rollover(storage: IStorage, today: date) -> Dict[int, Dict[str, Any]]:
+    """
+    Everything that changes because the day is now `today`, as update_many()
+    input. Past "week"/"month" due dates move to the current week/month,
+    recurring tasks whose occurrence passed move to their next date, and
+    inbox tasks that are due or overdue are promoted to active.
+    """
+    updates: Dict[int, Dict[str, Any]] = {}
+    for task in storage.get_tasks(
+        schedule__in=ROLLING_SCHEDULES, recurrence__isnull=True, due_date__lt=today, state__ne="completed"
+    ):
+        updates[task.id] = {"due_date": schedule_due_date(task.schedule, today)}
+    for task in storage.get_tasks(recurrence__isnull=False, due_date__lt=today, state__ne="completed"):
+        updates[task.id] = {"due_date": first_occurrence(task.recurrence, today, anchor=task.due_date)}
+    for task in storage.get_tasks(state="inbox", due_date__lte=today):
+        updates.setdefault(task.id, {})["state"] = "active"
+    return updates
@@ -1,43 +1,86 @@
-from storage_interface import IStorage, Task
-from typing import List, Dict, Any, Optional
+from storage_interface import (
+    IStorage, Task, DailyStat, AnyOf, SEED_TASKS, parse_filter, value_predicate, wants_archived, materialize_filters, task_path,
+)
+from analytics import stat_deltas, apply_deltas, backfill
+from memory_diagnostics import deep_sizeof
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from datetime import datetime, date
+from functools import lru_cache
+import bisect
+import operator
+from collections import deque
+
+def _freeze(filters: Dict[str, Any]) -> Tuple:
+    """Hashable form of a filter dict, used as the predicate cache key"""
+    return tuple(sorted(
+        (key, frozenset(value) if key.endswith("__in") else value)
+        for key, value in filters.items()
+    ))
+
+def _compile_condition(key: str, value: Any) -> Callable[[Task], bool]:
+    field, op = parse_filter(key)
+    get = operator.attrgetter(field)
+    test = value_predicate(op, value)
+    return lambda task: test(get(task))
+
+def _compile_and(frozen: Tuple) -> List[Callable[[Task], bool]]:
+    return [_compile_condition(key, value) for key, value in frozen]
+
+@lru_cache(maxsize=256)
+def _compile_filters(frozen: Tuple, frozen_any_of: Tuple) -> Callable[[Task], bool]:
+    """Compile a filter set into a single predicate; cached per distinct filter set"""
+    checks = _compile_and(frozen)
+    for alternatives in frozen_any_of:
+        groups = [_compile_and(alt) for alt in alternatives]
+        checks.append(lambda task, groups=groups: any(all(c(task) for c in g) for g in groups))
+    return lambda task: all(check(task) for check in checks)
 
 class InMemoryStorage(IStorage):
-    def __init__(self):
+    def __init__(self, today: Callable[[], date] = date.today):
+        self._today = today  # The day rollup inbox counts go to
         self._tasks: Dict[int, Task] = {}
+        self._archive: Dict[int, Task] = {}  # Completed tasks out of the working set
         self._next_id = 1
+        self._changes: Dict[int, Tuple[int, bool]] = {}  # task_id -> (version, deleted)
+        self._tombstones: deque = deque()  # (version, task_id) of deletions, oldest first
+        self._version = 0
+        self._stats: Dict[Tuple[date, str], Dict[str, float]] = {}  # Daily rollups
+        self._paths: List[Tuple[str, int]] = []  # Sorted (path, task_id): subtrees are contiguous ranges
         self._seed_data()
 
     def _seed_data(self):
-        # Seed some dummy tasks
-        self.add_task({"title": "create datasets management webapp", "due_date": date(2025, 7, 7), "project": "maybe", "schedule": "today", "state": "inbox"})
-        self.add_task({"title": "create local docker repository", "project": "maybe", "state": "inbox"})
-        self.add_task({"title": "basketball player tracking: get detections without NMS", "project": "maybe", "state": "inbox"})
-        self.add_task({"title": "generic framework for resuming processes after power fail/restart", "due_date": date(2025, 7, 11), "project": "next", "schedule": "week", "state": "active"})
-        self.add_task({"title": "joint ball and carrier detection", "state": "inbox"})
-        self.add_task({"title": "Vollyball total match count", "due_date": date(2025, 9, 15), "project": "maybe", "state": "inbox"})
-        self.add_task({"title": "Ball carrier filter", "due_date": date(2025, 9, 22), "project": "next", "state": "inbox"})
-
-
-    def get_tasks(self, **filters: Any) -> List[Task]:
-        filtered_tasks = []
-        for task in self._tasks.values():
-            match = True
-            for key, value in filters.items():
-                if key.endswith('__ne'):
-                    attr_name = key[:-4] # Remove '__ne'
-                    if hasattr(task, attr_name) and getattr(task, attr_name) == value:
-                        match = False
-                        break
-                else:
-                    if not hasattr(task, key) or getattr(task, key) != value:
-                        match = False
-                        break
-            if match:
-                filtered_tasks.append(task)
-        return filtered_tasks
+        for task_data in SEED_TASKS:
+            self.add_task(task_data)
+
+    def _log_change(self, task_id: int, deleted: bool = False):
+        self._version += 1
+        self._changes[task_id] = (self._version, deleted)
+        if deleted:
+            self._tombstones.append((self._version, task_id))
+        # Forget deletions past the retention horizon; clients that old resync
+        horizon = self.get_change_horizon()
+        while self._tombstones and self._tombstones[0][0] <= horizon:
+            del self._changes[self._tombstones.popleft()[1]]
+
+    def get_tasks(self, *any_of: AnyOf, **filters: Any) -> List[Task]:
+        filters = materialize_filters(filters)
+        tasks = list(self._tasks.values())
+        if wants_archived(filters, any_of):
+            tasks.extend(self._archive.values())
+
+        predicate = _compile_filters(
+            _freeze(filters),
+            tuple(tuple(_freeze(alt) for alt in group.alternatives) for group in any_of),
+        )
+        return [task for task in tasks if predicate(task)]
 
     def add_task(self, task_data: Dict[str, Any]) -> Task:
+        parent = None
+        if task_data.get("parent_id") is not None:
+            parent = self.get_task_by_id(task_data["parent_id"])
+            if parent is None:
+                raise ValueError(f"Unknown parent task: {task_data['parent_id']}")
+
         # Generate ID and fill in default/calculated fields
         task_id = self._next_id
         self._next_id += 1
@@ -49,8 +92,11 @@ class InMemoryStorage(IStorage):
             "description": task_data.get("description"),
             "state": task_data.get("state", "inbox"),
             "schedule": task_data.get("schedule"),
+            "recurrence": task_data.get("recurrence"),
             "due_date": task_data.get("due_date"),
             "project": task_data.get("project", "default"),
+            "parent_id": parent.id if parent else None,
+            "path": task_path(task_id, parent),
             "completed_at": None,
             "created_at": now,
             "updated_at": now,
@@ -59,36 +105,100 @@ class InMemoryStorage(IStorage):
         # Validate with Pydantic model
         new_task = Task(**full_task_data)
         self._tasks[task_id] = new_task
+        bisect.insort(self._paths, (new_task.path, task_id))
+        self._log_change(task_id)
+        apply_deltas(self._stats, stat_deltas(None, new_task, self._today()))
         return new_task
 
     def get_task_by_id(self, task_id: int) -> Optional[Task]:
-        return self._tasks.get(task_id)
+        return self._tasks.get(task_id) or self._archive.get(task_id)
 
     def update_task(self, task_id: int, update_data: Dict[str, Any]) -> Optional[Task]:
-        task = self._tasks.get(task_id)
+        task = self._tasks.get(task_id) or self._archive.get(task_id)
         if task:
             updated_fields = task.dict()
             for key, value in update_data.items():
-                if key in updated_fields and key not in ["id", "created_at"]:
+                if key in updated_fields and key not in ["id", "created_at", "parent_id", "path"]:
                     updated_fields[key] = value
             updated_fields["updated_at"] = datetime.now()
             
             # Re-validate with Pydantic model
             updated_task = Task(**updated_fields)
-            self._tasks[task_id] = updated_task
+            if task_id in self._archive and updated_task.state == "completed":
+                self._archive[task_id] = updated_task
+            else:
+                # Reopened tasks move back into the working set
+                self._archive.pop(task_id, None)
+                self._tasks[task_id] = updated_task
+            self._log_change(task_id)
+            apply_deltas(self._stats, stat_deltas(task, updated_task, self._today()))
             return updated_task
         return None
 
     def delete_task(self, task_id: int) -> bool:
         if task_id in self._tasks:
-            del self._tasks[task_id]
-            return True
-        return False
+            task = self._tasks.pop(task_id)
+        elif task_id in self._archive:
+            task = self._archive.pop(task_id)
+        else:
+            return False
+        index = bisect.bisect_left(self._paths, (task.path, task_id))
+        if index < len(self._paths) and self._paths[index] == (task.path, task_id):
+            del self._paths[index]
+        self._log_change(task_id, deleted=True)
+        apply_deltas(self._stats, stat_deltas(task, None, self._today()))
+        return True
+
+    def get_subtree(self, task_id: int) -> List[Task]:
+        task = self.get_task_by_id(task_id)
+        if task is None:
+            return []
+        # Everything that starts with the path sorts between it and path + U+10FFFF
+        start = bisect.bisect_left(self._paths, (task.path, 0))
+        end = bisect.bisect_left(self._paths, (task.path + "\U0010ffff", 0))
+        return [self._tasks[i] for _, i in self._paths[start:end] if i in self._tasks]
 
     def get_projects(self) -> List[str]:
         projects = {task.project for task in self._tasks.values() if task.project and task.project != "default"}
         return sorted(list(projects))
 
+    def archive_completed_tasks(self, completed_before: datetime, batch_size: int = 500) -> int:
+        batch = [
+            task_id for task_id, task in self._tasks.items()
+            if task.state == "completed" and task.completed_at and task.completed_at < completed_before
+        ][:batch_size]
+        for task_id in batch:
+            self._archive[task_id] = self._tasks.pop(task_id)
+        return len(batch)
+
+    def get_daily_stats(self, start: date, end: date) -> List[DailyStat]:
+        return [
+            DailyStat(day=day, project=project, **fields)
+            for (day, project), fields in self._stats.items() if start <= day <= end
+        ]
+
+    def rebuild_daily_stats(self) -> int:
+        self._stats = backfill(list(self._tasks.values()) + list(self._archive.values()))
+        return len(self._stats)
+
+    def memory_footprint(self) -> Dict[str, int]:
+        # Everything is Python objects hanging off self
+        return {"tasks": len(self._tasks) + len(self._archive), "bytes": deep_sizeof(self)}
+
+    def get_version(self) -> int:
+        return self._version
+
+    def get_changes(self, since: int = 0) -> Tuple[int, List[Task], List[int]]:
+        tasks, deleted = [], []
+        for task_id, (version, is_deleted) in self._changes.items():
+            if version <= since:
+                continue
+            if is_deleted:
+                deleted.append(task_id)
+            else:
+                tasks.append(self.get_task_by_id(task_id))
+        return self._version, tasks, deleted
+
 # Initialize the in-memory storage
 storage = InMemoryStorage()
 
@@ -1,25 +1,131 @@
-import calendar
+import asyncio
+import hashlib
+import logging
+import os
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from fasthtml.common import *
 from fasthtml.svg import *
 from fasthtml.svg import Path as SvgPath
 
 from datetime import datetime, date, timedelta
 from pathlib import Path
-from starlette.responses import HTMLResponse
+from starlette.responses import HTMLResponse, JSONResponse
 from starlette.requests import Request
+from starlette.concurrency import run_in_threadpool
 
+from html import escape
 from pydantic import BaseModel  # Added this import
 
-from storage_interface import IStorage
+from storage_interface import IStorage, PROJECT_SEPARATOR, project_subtree
 from in_memory_storage import InMemoryStorage, Task
 from sqlite_storage import SQLiteStorage
+from precompiled import Template, slot
+from fragment_cache import FragmentCache
+from singleflight import SingleFlight
+from analytics import STAT_FIELDS
+from memory_diagnostics import MemoryTracker, object_counts, process_rss
+from traffic_capture import TrafficCapture
+from recurrence import WEEKDAYS, parse_rule, next_occurrence, first_occurrence, describe_rule
+from day_rollover import DayClock, plan_rollover, schedule_due_date
+
+# The day request paths work with; moved on by roll_over_at_day_boundaries()
+day_clock = DayClock()
+
+
+def make_storage(backend: str) -> IStorage:
+    """The storage named by GTD_STORAGE: "sqlite" (the default, GTD_DB_PATH or ./gtd.db), "memory" or "columnar"."""
+    # Rollups count inbox moves on the same day the views show
+    today = lambda: day_clock.today
+    if backend == "sqlite":
+        return SQLiteStorage(os.environ.get("GTD_DB_PATH", "gtd.db"), today=today)
+    if backend == "memory":
+        return InMemoryStorage(today=today)
+    if backend == "columnar":
+        from columnar_storage import ColumnarStorage  # Needs numpy
+        return ColumnarStorage(today=today)
+    raise ValueError(f"Unknown GTD_STORAGE backend: {backend!r}")
+
+
+storage = make_storage(os.environ.get("GTD_STORAGE", "sqlite"))
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: the /debug/memory endpoints, and allocation tracing for them
+# (tracemalloc slows allocation-heavy code, so it is a separate switch)
+MEMORY_DIAGNOSTICS = os.environ.get("GTD_DEBUG_MEMORY") == "1"
+memory_tracker = MemoryTracker()
+if MEMORY_DIAGNOSTICS and os.environ.get("GTD_TRACEMALLOC") == "1":
+    memory_tracker.start()
+
+# Opt-in: prefetch a task's edit form when the pointer rests on its row
+PREFETCH_EDIT_FORMS = os.environ.get("GTD_PREFETCH_EDIT_FORMS") == "1"
+
+# Completed tasks older than this are moved out of the working set
+ARCHIVE_AFTER_DAYS = 30
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_INTERVAL_SECONDS = 60 * 60
+
+
+async def archive_completed_tasks_periodically():
+    """Background job: archive old completed tasks in batches, then sleep."""
+    while True:
+        cutoff = datetime.now() - timedelta(days=ARCHIVE_AFTER_DAYS)
+        try:
+            # Keep going while full batches come back; yield between batches
+            while await asyncio.to_thread(storage.archive_completed_tasks, cutoff, ARCHIVE_BATCH_SIZE) == ARCHIVE_BATCH_SIZE:
+                await asyncio.sleep(0)
+        except Exception:
+            logger.exception("Archiving completed tasks failed")
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+
+# Re-check the date at least this often, in case the clock jumps or the host sleeps
+ROLLOVER_CHECK_SECONDS = 15 * 60
+
+
+def roll_over_day() -> int:
+    """
+    Bring stored tasks and caches up to day_clock.today in one pass: roll
+    relative schedules and missed recurrences forward, promote due inbox
+    tasks, and drop everything rendered for the previous day.
+    """
+    updated = storage.update_many(plan_rollover(storage, day_clock.today))
+    due_date_badge.cache_clear()
+    view_renders.clear()
+    return updated
+
+
+async def roll_over_at_day_boundaries():
+    """Background job: run roll_over_day() at startup and whenever the date changes."""
+    changed = True
+    while True:
+        if changed:
+            try:
+                updated = await asyncio.to_thread(roll_over_day)
+                logger.info("Rolled over to %s: %d tasks updated", day_clock.today, updated)
+            except Exception:
+                logger.exception("Day rollover failed")
+        await asyncio.sleep(min(day_clock.seconds_until_tomorrow() + 1, ROLLOVER_CHECK_SECONDS))
+        changed = day_clock.advance()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    archiver = asyncio.create_task(archive_completed_tasks_periodically())
+    rollover = asyncio.create_task(roll_over_at_day_boundaries())
+    yield
+    archiver.cancel()
+    rollover.cancel()
 
-# Initialize the in-memory storage
-# storage = InMemoryStorage()
-storage = SQLiteStorage()
 
 # FastHTML App Initialization - using idiomatic pattern
-app, rt = fast_app()
+app, rt = fast_app(lifespan=lifespan)
+
+# Opt-in: record anonymized request traces (JSONL) for replay_traffic.py
+TRAFFIC_CAPTURE_PATH = os.environ.get("GTD_CAPTURE_TRAFFIC")
+if TRAFFIC_CAPTURE_PATH:
+    app.add_middleware(TrafficCapture, path=TRAFFIC_CAPTURE_PATH)
 
 
 # Pydantic model for adding a new task from the form
@@ -35,121 +141,206 @@ class EditTaskForm(BaseModel):
     description: Optional[str] = None
     project: Optional[str] = None
     schedule: Optional[str] = None  # Added schedule field
+    recurrence: Optional[str] = None  # A REPEAT_PRESETS value or a rule, see recurrence.py
 
 
-# Helper function to render a single task item HTML using FastHTML DSL
-def render_task_item(task: Task):
-    date_label = ""
-    date_color = ""
-    date_icon = Svg( # Default calendar icon
-        SvgPath(stroke_linecap="round", stroke_linejoin="round", stroke_width="2", d="M8 7V3m8 4V3m-9 8h10M5 21h14a2 2 0 002-2V7a2 2 0 00-2-2H5a2 2 0 00-2 2v12a2 2 0 002 2z"),
-        cls="w-4 h-4", fill="none", stroke="currentColor", viewBox="0 0 24 24"
-    )
+CALENDAR_ICON = "M8 7V3m8 4V3m-9 8h10M5 21h14a2 2 0 002-2V7a2 2 0 00-2-2H5a2 2 0 00-2 2v12a2 2 0 002 2z"
+CHECK_ICON = "M5 13l4 4L19 7"
 
+
+def task_date_label(task: Task):
+    """Returns (label, color classes, icon path) for a task's date badge; label is "" for none."""
     if task.state == "completed":
-        date_icon = Svg( # Checkmark icon for completed
-            SvgPath(stroke_linecap="round", stroke_linejoin="round", stroke_width="2", d="M5 13l4 4L19 7"),
-             cls="w-4 h-4", fill="none", stroke="currentColor", viewBox="0 0 24 24"
-        )
-        date_color = "text-gray-500"
         if task.completed_at:
-            date_label = f"Completed {task.completed_at.strftime('%b %d')}"
-        else:
-            date_label = "Completed" # Fallback if completed_at is None
-    elif task.due_date:
-        if task.due_date == date.today():
-            date_label = "Today"
-            date_color = "text-red-600"
-        elif task.due_date < date.today():
-            date_label = "Overdue"
-            date_color = "text-red-800 font-bold"
-        else:
-            date_label = task.due_date.strftime("%b %d") # e.g., Jul 07
-            date_color = "text-gray-500"
-    
-    project_html_element = None
-    if task.project and task.project != "default":
-        project_html_element = Span(
-            Span("#", cls="font-semibold text-gray-400"),
-            task.project,
-            cls="flex items-center gap-1.5 px-2 py-0.5 rounded text-sm font-medium bg-yellow-100 text-yellow-800",
-        )
-    elif task.project == "default":
-        project_html_element = Span(
-            Span("#", cls="font-semibold text-gray-400"),
-            "default",
-            cls="flex items-center gap-1.5 px-2 py-0.5 rounded text-sm font-medium bg-gray-100 text-gray-600",
-        )
+            return f"Completed {task.completed_at.strftime('%b %d')}", "text-gray-500", CHECK_ICON
+        return "Completed", "text-gray-500", CHECK_ICON # Fallback if completed_at is None
+    if task.due_date:
+        return due_date_badge(task.due_date, day_clock.today)
+    return "", "", CALENDAR_ICON
+
+
+@lru_cache(maxsize=1024)
+def due_date_badge(due_date: date, today: date):
+    """Badge for an open task's due date; computed once per date and day (cleared on rollover)."""
+    if due_date == today:
+        return "Today", "text-red-600", CALENDAR_ICON
+    elif due_date < today:
+        return "Overdue", "text-red-800 font-bold", CALENDAR_ICON
+    return due_date.strftime("%b %d"), "text-gray-500", CALENDAR_ICON # e.g., Jul 07
+
+
+def task_date_label_with_repeat(task: Task):
+    """task_date_label(), marking tasks that repeat."""
+    label, color, icon = task_date_label(task)
+    if label and task.recurrence:
+        label = f"{label} \u21bb"  # Clockwise arrow
+    return label, color, icon
+
+
+def date_span_ft(icon: str, label: str, color: str):
+    return Span(
+        Svg(
+            SvgPath(stroke_linecap="round", stroke_linejoin="round", stroke_width="2", d=icon),
+            cls="w-4 h-4", fill="none", stroke="currentColor", viewBox="0 0 24 24"
+        ),
+        label,
+        cls=f"flex items-center gap-1.5 text-sm {color}",
+    )
+
+
+def project_span_ft(project: str, is_default: bool = False):
+    return Span(
+        Span("#", cls="font-semibold text-gray-400"),
+        project,
+        cls="flex items-center gap-1.5 px-2 py-0.5 rounded text-sm font-medium "
+        + ("bg-gray-100 text-gray-600" if is_default else "bg-yellow-100 text-yellow-800"),
+    )
+
+
+# Left margin of a row or sidebar link by nesting depth (deeper levels share the last)
+NEST_CLASSES = ("", " ml-8", " ml-16")
+
 
-    checked_attr = True if task.state == "completed" else False
-    line_through_cls = "line-through text-gray-500" if task.state == "completed" else ""
+def nest_cls(depth: int) -> str:
+    return NEST_CLASSES[min(depth, len(NEST_CLASSES) - 1)]
 
+
+def task_item_ft(task_id, title, completed: bool, date_span, project_span, nesting: str = ""):
+    """Builds a task row. Fields may be real values or slot() placeholders."""
+    line_through_cls = "line-through text-gray-500" if completed else ""
     return Div(
         Input(
             type="checkbox",
-            checked=checked_attr,
+            checked=completed,
             cls="mt-1 flex-shrink-0 w-5 h-5 rounded-full border-gray-400 focus:ring-green-500",
-            hx_post=f"/toggle-task-complete/{task.id}",
+            hx_post=f"/toggle-task-complete/{task_id}",
             hx_target="#inbox-task-list-inner",  # Updated target
             hx_swap="innerHTML",
             onclick="event.stopPropagation();",
         ),  # Stop propagation to prevent opening edit modal
         Div(
-            P(task.title, cls=f"text-base text-gray-800 {line_through_cls}"),
+            P(title, cls=f"text-base text-gray-800 {line_through_cls}"),
             Div(
-                (
-                    Span(
-                        date_icon, # Use dynamic icon
-                        date_label,
-                        cls=f"flex items-center gap-1.5 text-sm {date_color}",
-                    )
-                    if date_label
-                    else None
-                ),
-                project_html_element,
+                date_span,
+                project_span,
                 cls="flex items-center gap-4 flex-wrap mt-1",
             ),
             cls="flex-1",
         ),
-        id=f"task-{task.id}",
-        hx_get=f"/get-task-data/{task.id}",
+        id=f"task-{task_id}",
+        hx_get=f"/get-task-data/{task_id}",
         hx_target="#editTaskModal-content-area",  # Target specific area in edit modal
         hx_swap="innerHTML",
         onclick="document.getElementById('editTaskModal').classList.remove('hidden');",  # Open modal via JS
-        cls="flex items-start gap-4 p-3 hover:bg-gray-50 rounded-lg border-b border-gray-200 cursor-pointer",
+        preload="mouseover" if PREFETCH_EDIT_FORMS else None,  # htmx preload extension
+        cls=f"flex items-start gap-4 p-3 hover:bg-gray-50 rounded-lg border-b border-gray-200 cursor-pointer{nesting}",
+    )
+
+
+# Helper function to render a single task item HTML using FastHTML DSL
+def render_task_item_ft(task: Task, depth: int = 0):
+    """Builds the full FT tree for a task row (the reference for TASK_ITEM_TEMPLATES)."""
+    date_label, date_color, date_icon = task_date_label_with_repeat(task)
+    project_html_element = None
+    if task.project:
+        project_html_element = project_span_ft(task.project, is_default=task.project == "default")
+    return task_item_ft(
+        task.id,
+        task.title,
+        task.state == "completed",
+        date_span_ft(date_icon, date_label, date_color) if date_label else None,
+        project_html_element,
+        nest_cls(depth),
     )
 
 
+# Static markup of task rows, serialized once; keyed by completed-ness
+TASK_ITEM_TEMPLATES = {
+    completed: Template(task_item_ft(
+        slot("id"), slot("title"), completed, slot("date_span"), slot("project_span"), slot("nesting")
+    ))
+    for completed in (False, True)
+}
+DATE_SPAN_TEMPLATES = {
+    icon: Template(date_span_ft(icon, slot("label"), slot("color"))) for icon in (CALENDAR_ICON, CHECK_ICON)
+}
+PROJECT_SPAN_TEMPLATE = Template(project_span_ft(slot("project")))
+DEFAULT_PROJECT_SPAN = to_xml(project_span_ft("default", is_default=True))
+
+
+def render_task_item(task: Task, depth: int = 0):
+    """Renders a task row from TASK_ITEM_TEMPLATES; same markup as render_task_item_ft()."""
+    date_label, date_color, date_icon = task_date_label_with_repeat(task)
+    date_span = ""
+    if date_label:
+        date_span = DATE_SPAN_TEMPLATES[date_icon].render(label=escape(date_label), color=date_color)
+    project_span = ""
+    if task.project == "default":
+        project_span = DEFAULT_PROJECT_SPAN
+    elif task.project:
+        project_span = PROJECT_SPAN_TEMPLATE.render(project=escape(task.project))
+    return TASK_ITEM_TEMPLATES[task.state == "completed"].render(
+        id=str(task.id), title=escape(task.title), date_span=date_span, project_span=project_span,
+        nesting=nest_cls(depth),
+    )
+
+
+def nest_subtasks(tasks: List[Task]) -> List[tuple]:
+    """
+    Order a view's tasks so subtasks follow their parent, as (task, depth).
+    Only ancestors shown in the same list count; siblings keep their order.
+    """
+    position = {task.id: i for i, task in enumerate(tasks)}
+    keys = {}
+    for task in tasks:
+        ancestors = [int(i) for i in (task.path or f"{task.id}/").split("/")[:-1]]
+        keys[task.id] = tuple(position[i] for i in ancestors if i in position)
+    return [(task, len(keys[task.id]) - 1) for task in sorted(tasks, key=lambda t: keys[t.id])]
+
+
 def get_projects_with_open_task_counts(storage: IStorage) -> List[Dict[str, Any]]:
-    project_counts = {}
-    # Consider all non-completed tasks as "open"
-    open_tasks = [
-        task for task in storage.get_tasks() if task.state != "completed"
+    # Consider all non-completed tasks as "open"; counts include nested projects
+    project_counts = storage.count_open_tasks_by_project_tree()
+    projects = [
+        {"name": name, "count": count, "label": name.split(PROJECT_SEPARATOR)[-1], "depth": name.count(PROJECT_SEPARATOR)}
+        for name, count in project_counts.items() if name and count > 0
     ]
-    for task in open_tasks:
-        if task.project:
-            project_counts[task.project] = project_counts.get(task.project, 0) + 1
-    
-    projects = [{"name": name, "count": count} for name, count in project_counts.items() if count > 0]
-    return sorted(projects, key=lambda p: p['name'])
+    # Sorting on the parts keeps "work/a" right under "work", ahead of "work-x"
+    return sorted(projects, key=lambda p: p['name'].split(PROJECT_SEPARATOR))
+
+# Identical concurrent /tasks requests share one render per data version
+view_renders = SingleFlight(maxsize=64)
+
 
 @rt("/tasks")
-def get_tasks(view: str = "inbox", project: str = None):  # Added project parameter
+async def get_tasks(view: str = "inbox", project: str = None):  # Added project parameter
     """Fetch and render tasks based on the selected view or project."""
-    # Calculate counts for each view
-    inbox_count = len(storage.get_tasks(state="inbox"))
-    today_tasks = storage.get_tasks(due_date=date.today())
-    today_count = len(storage.get_tasks(due_date=date.today(), state__ne="completed"))
-    # today_count = len(today_tasks)
-    active_count = len(storage.get_tasks(state="active"))
-    maybe_count = len(storage.get_tasks(state="maybe"))
-    projects_with_counts = get_projects_with_open_task_counts(storage)
+    key = (view, project, storage.get_version(), day_clock.today)
+    html = await view_renders.do(key, lambda: render_tasks_view(view, project))
+    return HTMLResponse(html)
+
 
+def render_sidebar_for(view: str, project: str = None):
+    """Query the sidebar counts and render it for the current view or project."""
+    return render_sidebar(
+        current_view=view,
+        current_project=project,
+        inbox_count=storage.count_tasks(state="inbox"),
+        today_count=storage.count_tasks(due_date=day_clock.today, state__ne="completed"),
+        active_count=storage.count_tasks(state="active"),
+        maybe_count=storage.count_tasks(state="maybe"),
+        projects=get_projects_with_open_task_counts(storage),
+    )
+
+
+def render_tasks_view(view: str = "inbox", project: str = None) -> str:
+    """Query and render the sidebar, header and task list for a view or project."""
     if project:
-        tasks = storage.get_tasks(project=project, state__ne="completed") # Get all non-completed tasks for a project
+        # All non-completed tasks in the project and the projects nested in it
+        tasks = storage.get_tasks(project_subtree(project), state__ne="completed")
         header_title = f"#{project}"
     elif view == "today":
-        tasks = today_tasks  # Use already fetched tasks
+        tasks = storage.get_tasks(due_date=day_clock.today)
         header_title = "Today"
     elif view == "active":
         tasks = storage.get_tasks(state="active")
@@ -169,18 +360,10 @@ def get_tasks(view: str = "inbox", project: str = None):  # Added project parame
         tasks = storage.get_tasks(state="inbox")
         header_title = "Inbox"
 
-    task_items = [render_task_item(task) for task in tasks]
+    task_items = [render_task_item(task, depth) for task, depth in nest_subtasks(tasks)]
 
-    return Group(
-        render_sidebar(
-            current_view=view,
-            current_project=project,
-            inbox_count=inbox_count,
-            today_count=today_count,
-            active_count=active_count,
-            maybe_count=maybe_count,
-            projects=projects_with_counts
-        ),
+    return to_xml(Group(
+        render_sidebar_for(view, project),
         H1(
             header_title,
             id="main-content-header",
@@ -188,8 +371,117 @@ def get_tasks(view: str = "inbox", project: str = None):  # Added project parame
             hx_swap_oob="true",
         ),
         Div(*task_items, id="inbox-task-list-inner"),
+    ))
+
+# Window shown by the /stats view
+STATS_DAYS = 14
+STATS_WEEKS = 8
+
+
+def format_duration(seconds: float) -> str:
+    if seconds >= 86400:
+        return f"{seconds / 86400:.1f} days"
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f} hours"
+    return f"{seconds / 60:.0f} min"
+
+
+def bar_rows(rows: List[tuple]):
+    """Label / value rows with a bar scaled to the largest value."""
+    top = max((value for _, value in rows), default=0) or 1
+    return Div(
+        *(Div(
+            Span(label, cls="w-24 text-sm text-gray-600"),
+            Div(Div(cls="h-3 bg-red-400 rounded", style=f"width: {value / top * 100:.0f}%"), cls="flex-1"),
+            Span(str(value), cls="w-10 text-right text-sm text-gray-700"),
+            cls="flex items-center gap-3",
+        ) for label, value in rows),
+        cls="space-y-1.5",
     )
 
+
+def render_stats_view() -> str:
+    """Render throughput reports from the daily rollups (never from the task tables)."""
+    today = day_clock.today
+    week_start = today - timedelta(days=today.weekday())
+    start = week_start - timedelta(weeks=STATS_WEEKS - 1)
+    rows = storage.get_daily_stats(start, today)
+
+    per_day: Dict[date, Dict[str, float]] = {}
+    per_week: Dict[date, int] = {}
+    per_project: Dict[str, Dict[str, float]] = {}
+    for row in rows:
+        for key, table in ((row.day, per_day), (row.project, per_project)):
+            totals = table.setdefault(key, dict.fromkeys(STAT_FIELDS, 0))
+            for field in STAT_FIELDS:
+                totals[field] += getattr(row, field)
+        monday = row.day - timedelta(days=row.day.weekday())
+        per_week[monday] = per_week.get(monday, 0) + row.completed
+
+    days = [today - timedelta(days=i) for i in reversed(range(STATS_DAYS))]
+    day_totals = [per_day.get(day, dict.fromkeys(STAT_FIELDS, 0)) for day in days]
+    completed = sum(t["completed"] for t in per_project.values())
+    lead_time = sum(t["lead_time_seconds"] for t in per_project.values())
+    inflow = sum(t["inbox_in"] for t in day_totals)
+    outflow = sum(t["inbox_out"] for t in day_totals)
+
+    def card(label, value):
+        return Div(
+            P(label, cls="text-sm text-gray-500"),
+            P(value, cls="text-2xl font-bold text-gray-800"),
+            cls="p-4 rounded-lg border border-gray-200",
+        )
+
+    def section(title, *content):
+        return Div(H3(title, cls="text-sm font-semibold text-gray-500 uppercase tracking-wider mb-3"), *content, cls="mb-8")
+
+    return to_xml(Group(
+        render_sidebar_for("stats"),
+        H1("Stats", id="main-content-header", _class="text-2xl font-bold", hx_swap_oob="true"),
+        Div(
+            Div(
+                card(f"Completed, last {STATS_WEEKS} weeks", str(completed)),
+                card("Average time to complete", format_duration(lead_time / completed) if completed else "-"),
+                card(f"Inbox in / out, last {STATS_DAYS} days", f"{inflow} / {outflow}"),
+                cls="grid grid-cols-3 gap-4 mb-8",
+            ),
+            section(
+                "Completed per day",
+                bar_rows([(day.strftime("%a %b %d"), t["completed"]) for day, t in zip(days, day_totals)]),
+            ),
+            section(
+                "Completed per week",
+                bar_rows([
+                    (monday.strftime("%b %d"), per_week.get(monday, 0))
+                    for monday in (start + timedelta(weeks=i) for i in range(STATS_WEEKS))
+                ]),
+            ),
+            section(
+                "By project",
+                Table(
+                    Tr(*(Th(h, cls="text-left text-sm font-medium text-gray-500 py-1") for h in
+                         ("Project", "Created", "Completed", "Avg. time to complete"))),
+                    *(Tr(
+                        Td(f"#{name}", cls="py-1"),
+                        Td(str(t["created"])),
+                        Td(str(t["completed"])),
+                        Td(format_duration(t["lead_time_seconds"] / t["completed"]) if t["completed"] else "-"),
+                        cls="text-sm text-gray-700",
+                    ) for name, t in sorted(per_project.items())),
+                    cls="w-full",
+                ),
+            ),
+            id="inbox-task-list-inner",
+        ),
+    ))
+
+
+@rt("/stats")
+def get():
+    """Productivity report: completions per day/week/project, inbox flow, time to complete."""
+    return HTMLResponse(render_stats_view())
+
+
 @rt("/projects-autocomplete")
 def projects_autocomplete(project: str = None, target_input_id: str = 'editTaskProject'):
     """Returns a list of project names for autocomplete."""
@@ -214,22 +506,68 @@ def projects_autocomplete(project: str = None, target_input_id: str = 'editTaskP
         ) for p in filtered_projects)
     )
 
+def add_next_occurrence(task: Task) -> Task:
+    """Create the occurrence after `task`, counting from its due date or today if later."""
+    today = day_clock.today
+    after = max(task.due_date or today, today)
+    rule = task.recurrence
+    if rule == "monthly" and task.due_date:
+        rule = f"monthly:{task.due_date.day}"  # Pin older rules before a short month can shift them
+    return storage.add_task({
+        "title": task.title,
+        "description": task.description,
+        "project": task.project,
+        "recurrence": rule,
+        "due_date": next_occurrence(rule, after, anchor=task.due_date),
+        "state": "active",
+    })
+
+
+def spawned_occurrence(task: Task) -> Optional[Task]:
+    """The open occurrence created when `task` was completed, if it is still there."""
+    if task.completed_at is None:
+        return None
+    # Completing a recurring task stamps it with the new occurrence's created_at
+    # Matched here rather than as a created_at filter, which would compile a fresh predicate per timestamp
+    candidates = storage.get_tasks(recurrence__isnull=False, state__ne="completed")
+    return next((t for t in candidates if t.created_at == task.completed_at), None)
+
+
 @rt("/toggle-task-complete/{task_id}")
 async def post(task_id: int, request: Request):
     """Toggles the completion state of a task."""
+    # Off the event loop (in the pool sync routes use), so concurrent toggles can share a group commit
+    if not await run_in_threadpool(toggle_task_complete, task_id):
+        return Div("Task not found", cls="text-red-500")
+    return await get_tasks(view=view_from_request(request))
+
+
+def toggle_task_complete(task_id: int) -> bool:
+    """Flip a task between completed and inbox; False if it doesn't exist."""
     task = storage.get_task_by_id(task_id)
     if not task:
-        return Div("Task not found", cls="text-red-500")
+        return False
 
     if task.state == "completed":
-        new_state = "inbox" 
-        completion_time = None
+        update_data = {"state": "inbox", "completed_at": None}
+        occurrence = spawned_occurrence(task)
+        if occurrence:
+            # Undoing a completion: the occurrence it created goes, and the rule comes back
+            storage.delete_task(occurrence.id)
+            update_data["recurrence"] = occurrence.recurrence
+        storage.update_task(task_id, update_data)
+    elif task.recurrence:
+        occurrence = add_next_occurrence(task)
+        # The rule moves to the new occurrence; this one is done for good.
+        # Sharing the timestamp is what lets spawned_occurrence() find it again.
+        storage.update_task(task_id, {"state": "completed", "completed_at": occurrence.created_at, "recurrence": None})
     else:
-        new_state = "completed"
-        completion_time = datetime.now()
+        storage.update_task(task_id, {"state": "completed", "completed_at": datetime.now()})
+    return True
 
-    storage.update_task(task_id, {"state": new_state, "completed_at": completion_time})
 
+def view_from_request(request: Request) -> str:
+    """The view the page was showing, from the URL htmx reports."""
     current_url = request.headers.get("hx-current-url", "")
     view = "inbox"
     try:
@@ -237,47 +575,34 @@ async def post(task_id: int, request: Request):
         view = query_params.get("view", "inbox")
     except (IndexError, ValueError):
         pass
+    return view
 
-    return get_tasks(view=view)
 
+LINK_CLASSES = "flex items-center justify-between px-3 py-2 rounded-lg hover:bg-gray-100 text-gray-700 font-medium text-base"
+CURRENT_LINK_CLASSES = "flex items-center justify-between px-3 py-2 rounded-lg bg-orange-100 text-orange-600 font-medium text-base"
+SIDEBAR_VIEWS = ["inbox", "today", "active", "maybe", "completed", "stats"]
 
-def render_sidebar(
-    current_view: str,
-    current_project: str = None,
-    inbox_count: int = 0,
-    today_count: int = 0,
-    active_count: int = 0,
-    maybe_count: int = 0,
-    projects: List[Dict[str, Any]] = None
-):
-    """Renders the sidebar, highlighting the current view or project and displaying counts."""
-    projects = projects or []
 
-    def get_link_classes(view_name: str = None, project_name: str = None):
-        # Check for view-based highlighting
-        if view_name and view_name == current_view and not current_project:
-            return "flex items-center justify-between px-3 py-2 rounded-lg bg-orange-100 text-orange-600 font-medium text-base"
-        # Check for project-based highlighting
-        if project_name and project_name == current_project:
-            return "flex items-center justify-between px-3 py-2 rounded-lg bg-orange-100 text-orange-600 font-medium text-base"
-        
-        return "flex items-center justify-between px-3 py-2 rounded-lg hover:bg-gray-100 text-gray-700 font-medium text-base"
-
-    # Generate project links dynamically
-    project_links = [
-        A(
-            Div(
-                Span("#", cls="font-semibold text-gray-400"),
-                Span(p['name']),
-                cls="flex items-center gap-3"
-            ),
-            Span(str(p['count']), cls="text-sm text-gray-500") if p['count'] > 0 else None,
-            hx_get=f"/tasks?project={p['name']}",
-            hx_target="#inbox-task-list-inner",
-            cls=get_link_classes(project_name=p['name'])
-        ) for p in projects
-    ]
+def count_badge_ft(count, cls: str = "text-sm text-gray-500"):
+    return Span(count, cls=cls)
+
+
+def project_link_ft(name, badge, link_classes: str, label=None):
+    return A(
+        Div(
+            Span("#", cls="font-semibold text-gray-400"),
+            Span(name if label is None else label),
+            cls="flex items-center gap-3"
+        ),
+        badge,
+        hx_get=f"/tasks?project={name}",
+        hx_target="#inbox-task-list-inner",
+        cls=link_classes
+    )
 
+
+def sidebar_ft(link_classes: Dict[str, str], badges: Dict[str, Any], project_links: List[Any]):
+    """Builds the sidebar. Classes, badges and links may be FT/values or slot() placeholders."""
     return Aside(
         Div(
             Div(
@@ -343,14 +668,10 @@ def render_sidebar(
                             Span("Inbox"),
                             cls="flex items-center gap-3",
                         ),
-                        (
-                            Span(str(inbox_count), cls="text-sm font-semibold")
-                            if inbox_count > 0
-                            else None
-                        ),
+                        badges["inbox"],
                         hx_get="/tasks?view=inbox",
                         hx_target="#inbox-task-list-inner",
-                        cls=get_link_classes(view_name="inbox"),
+                        cls=link_classes["inbox"],
                     ),
                     A(
                         Div(
@@ -369,14 +690,10 @@ def render_sidebar(
                             Span("Today"),
                             cls="flex items-center gap-3",
                         ),
-                        (
-                            Span(str(today_count), cls="text-sm text-gray-500")
-                            if today_count > 0
-                            else None
-                        ),
+                        badges["today"],
                         hx_get="/tasks?view=today",
                         hx_target="#inbox-task-list-inner",
-                        cls=get_link_classes(view_name="today"),
+                        cls=link_classes["today"],
                     ),
                     A(
                         Div(
@@ -394,14 +711,10 @@ def render_sidebar(
                             Span("Active"),
                             cls="flex items-center gap-3",
                         ),
-                        (
-                            Span(str(active_count), cls="text-sm text-gray-500")
-                            if active_count > 0
-                            else None
-                        ),
+                        badges["active"],
                         hx_get="/tasks?view=active",
                         hx_target="#inbox-task-list-inner",
-                        cls=get_link_classes(view_name="active"),
+                        cls=link_classes["active"],
                     ),
                     A(
                         Div(
@@ -420,14 +733,10 @@ def render_sidebar(
                             Span("Maybe"),
                             cls="flex items-center gap-3",
                         ),
-                        (
-                            Span(str(maybe_count), cls="text-sm text-gray-500")
-                            if maybe_count > 0
-                            else None
-                        ),
+                        badges["maybe"],
                         hx_get="/tasks?view=maybe",
                         hx_target="#inbox-task-list-inner",
-                        cls=get_link_classes(view_name="maybe"),
+                        cls=link_classes["maybe"],
                     ),
                     cls="space-y-1.5",
                 ),
@@ -452,7 +761,28 @@ def render_sidebar(
                         ),
                         hx_get="/tasks?view=completed",
                         hx_target="#inbox-task-list-inner",
-                        cls=get_link_classes(view_name="completed"),
+                        cls=link_classes["completed"],
+                    ),
+                    A(
+                        Div(
+                            Svg(
+                                SvgPath(
+                                    stroke_linecap="round",
+                                    stroke_linejoin="round",
+                                    stroke_width="2",
+                                    d="M9 19v-6a2 2 0 00-2-2H5a2 2 0 00-2 2v6a2 2 0 002 2h2a2 2 0 002-2zm0 0V9a2 2 0 012-2h2a2 2 0 012 2v10m-6 0a2 2 0 002 2h2a2 2 0 002-2m0 0V5a2 2 0 012-2h2a2 2 0 012 2v14a2 2 0 01-2 2h-2a2 2 0 01-2-2z",
+                                ),
+                                cls="w-5 h-5",
+                                fill="none",
+                                stroke="currentColor",
+                                viewBox="0 0 24 24",
+                            ),
+                            Span("Stats"),
+                            cls="flex items-center gap-3",
+                        ),
+                        hx_get="/stats",
+                        hx_target="#inbox-task-list-inner",
+                        cls=link_classes["stats"],
                     ),
                     cls="space-y-1.5",
                 ),
@@ -503,6 +833,78 @@ def render_sidebar(
     )
 
 
+def render_sidebar_ft(
+    current_view: str,
+    current_project: str = None,
+    inbox_count: int = 0,
+    today_count: int = 0,
+    active_count: int = 0,
+    maybe_count: int = 0,
+    projects: List[Dict[str, Any]] = None
+):
+    """Builds the full FT tree for the sidebar (the reference for SIDEBAR_TEMPLATE)."""
+    projects = projects or []
+    counts = {"inbox": inbox_count, "today": today_count, "active": active_count, "maybe": maybe_count}
+    link_classes = {
+        view: CURRENT_LINK_CLASSES if view == current_view and not current_project else LINK_CLASSES
+        for view in SIDEBAR_VIEWS
+    }
+    badges = {
+        view: count_badge_ft(str(count), "text-sm font-semibold" if view == "inbox" else "text-sm text-gray-500")
+        if count > 0 else None
+        for view, count in counts.items()
+    }
+    project_links = [
+        project_link_ft(
+            p['name'],
+            count_badge_ft(str(p['count'])) if p['count'] > 0 else None,
+            (CURRENT_LINK_CLASSES if p['name'] == current_project else LINK_CLASSES) + nest_cls(p.get('depth', 0)),
+            p.get('label', p['name']),
+        ) for p in projects
+    ]
+    return sidebar_ft(link_classes, badges, project_links)
+
+
+# Static sidebar markup (icons, headings, buttons) serialized once
+SIDEBAR_TEMPLATE = Template(sidebar_ft(
+    {view: slot(f"{view}_classes") for view in SIDEBAR_VIEWS},
+    {view: slot(f"{view}_badge") for view in SIDEBAR_VIEWS},
+    [slot("project_links")],
+))
+INBOX_BADGE_TEMPLATE = Template(count_badge_ft(slot("count"), "text-sm font-semibold"))
+BADGE_TEMPLATE = Template(count_badge_ft(slot("count")))
+PROJECT_LINK_TEMPLATE = Template(project_link_ft(slot("name"), slot("badge"), slot("classes"), slot("label")))
+
+
+def render_sidebar(
+    current_view: str,
+    current_project: str = None,
+    inbox_count: int = 0,
+    today_count: int = 0,
+    active_count: int = 0,
+    maybe_count: int = 0,
+    projects: List[Dict[str, Any]] = None
+):
+    """Renders the sidebar, highlighting the current view or project and displaying counts."""
+    projects = projects or []
+    counts = {"inbox": inbox_count, "today": today_count, "active": active_count, "maybe": maybe_count}
+    values = {}
+    for view in SIDEBAR_VIEWS:
+        values[f"{view}_classes"] = CURRENT_LINK_CLASSES if view == current_view and not current_project else LINK_CLASSES
+        count = counts.get(view, 0)
+        badge_template = INBOX_BADGE_TEMPLATE if view == "inbox" else BADGE_TEMPLATE
+        values[f"{view}_badge"] = badge_template.render(count=str(count)) if count > 0 else ""
+    values["project_links"] = "".join(
+        PROJECT_LINK_TEMPLATE.render(
+            name=escape(p['name']),
+            label=escape(p.get('label', p['name'])),
+            badge=BADGE_TEMPLATE.render(count=str(p['count'])) if p['count'] > 0 else "",
+            classes=(CURRENT_LINK_CLASSES if p['name'] == current_project else LINK_CLASSES) + nest_cls(p.get('depth', 0)),
+        ) for p in projects
+    )
+    return SIDEBAR_TEMPLATE.render(**values)
+
+
 @rt("/add-task")
 def post(form: AddTaskForm):
     """Handles adding a new task from the modal form."""
@@ -516,17 +918,74 @@ def post(form: AddTaskForm):
 
     # Re-render the task list and send a header to trigger modal closure
     # After adding a task, we should refresh the inbox view
-    response = get_tasks(view="inbox")
-    return Response(to_xml(response), headers={"HX-Trigger": "taskAdded"})
+    response = render_tasks_view(view="inbox")
+    return Response(response, headers={"HX-Trigger": "taskAdded"})
 
 
-@rt("/get-task-data/{task_id}")
-def get(task_id: int):
-    """Fetches a single task's data and renders the edit form."""
-    task = storage.get_task_by_id(task_id)
-    if not task:
+@rt("/add-subtask/{task_id}")
+def post(task_id: int, subtask_title: str, request: Request):
+    """Adds a subtask from the edit form; it starts in the parent's project."""
+    parent = storage.get_task_by_id(task_id)
+    if not parent:
         return Div("Task not found", cls="text-red-500")
+    if subtask_title.strip():
+        storage.add_task({"title": subtask_title.strip(), "parent_id": task_id, "project": parent.project})
+    response = render_tasks_view(view=view_from_request(request))
+    return Response(response, headers={"HX-Trigger": "taskEdited"})
 
+
+def schedule_options_ft(schedule: Optional[str]):
+    return (
+        Option(
+            "No Date",
+            value="none",
+            selected=schedule is None or schedule == "",
+        ),
+        Option("Today", value="today", selected=schedule == "today"),
+        Option("This Week", value="week", selected=schedule == "week"),
+        Option("This Month", value="month", selected=schedule == "month"),
+        Option("Maybe", value="maybe", selected=schedule == "maybe"),
+    )
+
+
+WEEKDAYS_RULE = "weekly:mon,tue,wed,thu,fri"
+# Repeat choices offered in the edit form; "weekly" repeats on the due date's weekday
+REPEAT_PRESETS = [
+    ("none", "Does not repeat"),
+    ("daily", "Daily"),
+    ("weekdays", "Every weekday"),
+    ("weekly", "Weekly"),
+    ("monthly", "Monthly"),
+]
+PRESET_FOR_RULE = {None: "none", "daily": "daily", WEEKDAYS_RULE: "weekdays", "monthly": "monthly"}
+
+
+def recurrence_options_ft(rule: Optional[str]):
+    selected = PRESET_FOR_RULE.get(rule)
+    options = [Option(label, value=value, selected=value == selected) for value, label in REPEAT_PRESETS]
+    if selected is None:
+        # A rule no preset produces as-is, e.g. "weekly:thu" or "every:3"
+        options.append(Option(describe_rule(rule), value=rule, selected=True))
+    return tuple(options)
+
+
+def resolve_recurrence(choice: Optional[str], anchor: date) -> Optional[str]:
+    """Turn the edit form's Repeat value into a stored rule (raises ValueError if invalid)."""
+    if not choice or choice == "none":
+        return None
+    if choice == "weekdays":
+        return WEEKDAYS_RULE
+    if choice == "weekly":
+        return f"weekly:{WEEKDAYS[anchor.weekday()]}"
+    if choice == "monthly":
+        # The day goes into the rule, so short months don't pull later occurrences back
+        return f"monthly:{anchor.day}"
+    parse_rule(choice)
+    return choice
+
+
+def edit_form_ft(task_id, title, description, schedule_options, project, recurrence_options):
+    """Builds the edit form. Fields may be real values or slot() placeholders."""
     return Form(
         Div(
             Label(
@@ -538,7 +997,7 @@ def get(task_id: int):
                 type="text",
                 id="editTaskName",
                 name="title",
-                value=task.title,
+                value=title,
                 cls="w-full px-4 py-2.5 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-red-500 text-base",
             ),
             cls="mb-4",
@@ -550,7 +1009,7 @@ def get(task_id: int):
                 cls="block text-base font-medium text-gray-700 mb-2",
             ),
             Textarea(
-                task.description or "",
+                description,
                 id="editTaskDescription",
                 name="description",
                 cls="w-full px-4 py-2.5 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-red-500 resize-y h-24 text-base",
@@ -558,16 +1017,22 @@ def get(task_id: int):
             cls="mb-4",
         ),
         Div(
+            Label(
+                "Repeat",
+                fr="editTaskRecurrence",
+                cls="block text-base font-medium text-gray-700 mb-2",
+            ),
             Select(
-                Option(
-                    "No Date",
-                    value="none",
-                    selected=task.schedule is None or task.schedule == "",
-                ),
-                Option("Today", value="today", selected=task.schedule == "today"),
-                Option("This Week", value="week", selected=task.schedule == "week"),
-                Option("This Month", value="month", selected=task.schedule == "month"),
-                Option("Maybe", value="maybe", selected=task.schedule == "maybe"),
+                recurrence_options,
+                name="recurrence",
+                id="editTaskRecurrence",
+                cls="block w-full px-4 py-2.5 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-red-500 text-base",
+            ),
+            cls="mb-4",
+        ),
+        Div(
+            Select(
+                schedule_options,
                 name="schedule",
                 id="editTaskSchedule",
                 cls="block w-full px-4 py-2.5 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-red-500 text-base",
@@ -577,7 +1042,7 @@ def get(task_id: int):
                     type="text",
                     id="editTaskProject",
                     name="project",
-                    value=task.project if task.project != "default" else "",
+                    value=project,
                     cls="w-full px-4 py-2.5 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-red-500 text-base",
                     placeholder="Project (e.g., #Work)",
                     hx_get="/projects-autocomplete?target_input_id=editTaskProject",
@@ -593,6 +1058,25 @@ def get(task_id: int):
             cls="flex items-start gap-4 mb-6 relative"
         ),
         # Div(id="editTaskProject-suggestions", cls="border rounded-md bg-white max-h-40 overflow-y-auto absolute top-full left-0 right-0 z-10 shadow-lg"), # Suggestions will be loaded here
+        Div(
+            Input(
+                type="text",
+                id="editTaskSubtask",
+                name="subtask_title",
+                placeholder="Add a subtask",
+                cls="flex-1 px-4 py-2.5 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-red-500 text-base",
+            ),
+            Button(
+                "Add",
+                type="button",
+                hx_post=f"/add-subtask/{task_id}",
+                hx_include="#editTaskSubtask",
+                hx_target="#inbox-task-list-inner",
+                hx_swap="innerHTML",
+                cls="px-5 py-2.5 text-base font-medium text-gray-700 border border-gray-300 hover:bg-gray-100 rounded-md",
+            ),
+            cls="flex items-center gap-3 mb-6",
+        ),
         Div(
             Button(
                 "Cancel",
@@ -607,16 +1091,92 @@ def get(task_id: int):
             ),
             cls="flex items-center justify-end gap-3",
         ),
-        hx_put=f"/update-task/{task.id}",  # HTMX PUT request to update task
+        hx_put=f"/update-task/{task_id}",  # HTMX PUT request to update task
         hx_target="#inbox-task-list",  # Target to replace after update
         hx_swap="innerHTML",  # Swap innerHTML of the target
         # hx_trigger="taskEdited from:body"  # Custom event to close modal after success
     )
 
 
+def render_edit_form_ft(task: Task):
+    """Builds the full FT tree for the edit form (the reference for EDIT_FORM_TEMPLATE)."""
+    return edit_form_ft(
+        task.id,
+        task.title,
+        task.description or "",
+        schedule_options_ft(task.schedule),
+        task.project if task.project != "default" else "",
+        recurrence_options_ft(task.recurrence),
+    )
+
+
+# Static edit form markup serialized once, plus the option list for each schedule
+EDIT_FORM_TEMPLATE = Template(edit_form_ft(
+    slot("id"), slot("title"), slot("description"), slot("schedule_options"), slot("project"),
+    slot("recurrence_options"),
+))
+SCHEDULE_OPTIONS = {
+    schedule: to_xml(schedule_options_ft(schedule)) for schedule in (None, "today", "week", "month", "maybe")
+}
+RECURRENCE_OPTIONS = {rule: to_xml(recurrence_options_ft(rule)) for rule in PRESET_FOR_RULE}
+
+
+# Rendered edit forms keyed by ETag; fills up from prefetches and repeat opens
+edit_form_cache = FragmentCache(maxsize=512)
+# Changes whenever the form markup does, so a deploy invalidates client caches
+EDIT_FORM_VERSION = hashlib.sha1(EDIT_FORM_TEMPLATE.render(
+    id="", title="", description="", schedule_options="", project="", recurrence_options=""
+).encode()).hexdigest()[:8]
+
+
+def edit_form_etag(task: Task) -> str:
+    """The edit form only depends on the task, whose updated_at moves on every write."""
+    return f'"{EDIT_FORM_VERSION}-{task.id}-{task.updated_at.timestamp():.6f}"'
+
+
+def render_edit_form(task: Task):
+    """Renders the edit form from EDIT_FORM_TEMPLATE; same markup as render_edit_form_ft()."""
+    schedule_options = SCHEDULE_OPTIONS.get(task.schedule or None)
+    if schedule_options is None:
+        schedule_options = to_xml(schedule_options_ft(task.schedule))
+    recurrence_options = RECURRENCE_OPTIONS.get(task.recurrence)
+    if recurrence_options is None:
+        recurrence_options = to_xml(recurrence_options_ft(task.recurrence))
+    return EDIT_FORM_TEMPLATE.render(
+        recurrence_options=recurrence_options,
+        id=str(task.id),
+        title=escape(task.title),
+        description=escape(task.description or ""),
+        schedule_options=schedule_options,
+        project=escape(task.project if task.project != "default" else ""),
+    )
+
+
+@rt("/get-task-data/{task_id}")
+def get(task_id: int, request: Request):
+    """Fetches a single task's data and renders the edit form."""
+    task = storage.get_task_by_id(task_id)
+    if not task:
+        return Div("Task not found", cls="text-red-500")
+
+    etag = edit_form_etag(task)
+    # no-cache: browsers keep the form but revalidate it with If-None-Match
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    html = edit_form_cache.get(etag)
+    if html is None:
+        html = render_edit_form(task)
+        edit_form_cache.put(etag, html)
+    return HTMLResponse(html, headers=headers)
+
+
 @rt("/update-task/{task_id}")
-async def put(task_id: int, form: EditTaskForm):
+def put(task_id: int, form: EditTaskForm):
     """Handles updating an existing task from the modal form."""
+    # Sync so it runs in the threadpool: a blocking write here would stall the
+    # event loop and keep concurrent updates from sharing a group commit
     update_data = form.model_dump(exclude_unset=True)
 
     # Calculate due_date based on schedule
@@ -624,22 +1184,10 @@ async def put(task_id: int, form: EditTaskForm):
     due_date = None
     new_state = None  # To store potential new state
 
-    if schedule == "today":
-        due_date = date.today()
-        new_state = "active"  # A task with a 'today' schedule should be active
-    elif schedule == "week":
-        today = date.today()
-        # Calculate days until next Friday (weekday 4)
-        days_until_friday = (4 - today.weekday() + 7) % 7
-        due_date = today + timedelta(days=days_until_friday)
-        new_state = "active"  # A task with a 'week' schedule should be active
-    elif schedule == "month":
-        today = date.today()
-        year = today.year
-        month = today.month
-        last_day = calendar.monthrange(year, month)[1]
-        due_date = date(year, month, last_day)
-        new_state = "active"  # A task with a 'month' schedule should be active
+    if schedule in ("today", "week", "month"):
+        # Week and month due dates are moved forward by the day rollover once they pass
+        due_date = schedule_due_date(schedule, day_clock.today)
+        new_state = "active"  # A task with a 'today', 'week' or 'month' schedule should be active
     elif schedule == "maybe":
         due_date = None
         new_state = "maybe"  # Set state to 'maybe' if schedule is 'maybe'
@@ -649,6 +1197,23 @@ async def put(task_id: int, form: EditTaskForm):
         due_date = None
         new_state = "inbox"  # Move it back to inbox if no specific schedule
 
+    task = storage.get_task_by_id(task_id)
+    stored_due_date = task.due_date if task else None
+    try:
+        recurrence = resolve_recurrence(form.recurrence, due_date or stored_due_date or day_clock.today)
+    except ValueError as e:
+        return Div(str(e), cls="text-red-500")
+    if recurrence:
+        if task and recurrence == task.recurrence and schedule in (None, "none") and stored_due_date:
+            # Same rule and no new schedule (e.g. only the title changed): keep the next occurrence
+            due_date = stored_due_date
+        else:
+            # A recurring task is stored as its next occurrence only
+            due_date = first_occurrence(recurrence, due_date or day_clock.today, anchor=stored_due_date)
+        if new_state in (None, "inbox"):
+            new_state = "active"
+    update_data["recurrence"] = recurrence
+
     update_data["due_date"] = due_date
     update_data["schedule"] = schedule  # Store the selected schedule string
 
@@ -664,8 +1229,65 @@ async def put(task_id: int, form: EditTaskForm):
         return Div("Task not found or failed to update", cls="text-red-500")
 
     # Re-render the task list and send a header to trigger modal closure
-    response = get_tasks(view="inbox")  # After updating, refresh to inbox view
-    return Response(to_xml(response), headers={"HX-Trigger": "taskEdited"})
+    response = render_tasks_view(view="inbox")  # After updating, refresh to inbox view
+    return Response(response, headers={"HX-Trigger": "taskEdited"})
+
+
+@rt("/changes")
+def get(since: int = 0):
+    """
+    Returns the tasks created, updated or deleted after a change-log version, as JSON.
+    Old deletions are pruned, so a client behind the retention horizon gets every
+    task with "resync": true and should replace what it has.
+    """
+    resync = since < storage.get_change_horizon()
+    version, tasks, deleted = storage.get_changes(0 if resync else since)
+    return JSONResponse({
+        "version": version,
+        "resync": resync,
+        "tasks": [task.model_dump(mode="json") for task in tasks],
+        "deleted": [] if resync else deleted,
+    })
+
+
+@rt("/debug/cache-stats")
+def get():
+    """Hit/coalesce counters for the view render and edit form caches, as JSON."""
+    return JSONResponse({
+        "tasks_view": view_renders.stats(),
+        "edit_form": {"hits": edit_form_cache.hits, "misses": edit_form_cache.misses, "size": len(edit_form_cache)},
+    })
+
+
+# Off unless GTD_DEBUG_MEMORY=1: every call runs a full gc pass and walks all live objects
+if MEMORY_DIAGNOSTICS:
+    @rt("/debug/memory")
+    def get(top: int = 20):
+        """
+        Memory diagnostics as JSON: process RSS, tracemalloc top allocation sites
+        and growth since the baseline (with GTD_TRACEMALLOC=1), live objects by
+        type, and the storage backend's estimated bytes per task.
+        """
+        footprint = storage.memory_footprint()
+        return JSONResponse({
+            "rss_bytes": process_rss(),
+            "tracemalloc": memory_tracker.report(limit=top),
+            "objects": object_counts(limit=top),
+            "storage": {
+                "backend": type(storage).__name__,
+                **footprint,
+                "bytes_per_task": footprint["bytes"] // footprint["tasks"] if footprint["tasks"] else None,
+            },
+            "caches": {"tasks_view": view_renders.stats()["size"], "edit_form": len(edit_form_cache)},
+        })
+
+    @rt("/debug/memory/baseline")
+    def post():
+        """Takes a new tracemalloc baseline, e.g. once caches have warmed up."""
+        if not memory_tracker.tracing:
+            return JSONResponse({"tracing": False}, status_code=409)
+        memory_tracker.reset_baseline()
+        return JSONResponse({"tracing": True})
 
 
 # Index route - serves the main HTML page
@@ -0,0 +1,130 @@
+import gc
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """
+    Approximate bytes held by an object and everything it references
+    through containers and instance attributes. Shared objects are counted
+    once; interned strings and small ints are counted like any other.
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__") and not isinstance(item, type):
+            stack.append(item.__dict__)
+    return total
+
+
+def object_counts(limit: int = 25) -> List[Dict[str, Any]]:
+    """Live gc-tracked objects by type, most common first"""
+    gc.collect()
+    counts = Counter(type(obj).__qualname__ for obj in gc.get_objects())
+    return [{"type": name, "count": count} for name, count in counts.most_common(limit)]
+
+
+def _stat_dict(stat) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    entry = {"where": f"{frame.filename}:{frame.lineno}", "size": stat.size, "count": stat.count}
+    if hasattr(stat, "size_diff"):
+        entry["size_diff"] = stat.size_diff
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+class MemoryTracker:
+    """
+    tracemalloc snapshots for a long-running process. The baseline is the
+    snapshot later ones are diffed against; take a new one after warm-up
+    so caches filling up don't read as a leak.
+    """
+
+    def __init__(self, frames: int = 1):
+        self.frames = frames
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self.reset_baseline()
+
+    def stop(self):
+        tracemalloc.stop()
+        self._baseline = None
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        # Our own bookkeeping would otherwise top every diff
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def reset_baseline(self):
+        with self._lock:
+            self._baseline = self._snapshot()
+
+    def report(self, limit: int = 20) -> Dict[str, Any]:
+        """Current traced totals, the top allocation sites, and the top growth since the baseline"""
+        if not self.tracing:
+            return {"tracing": False}
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = self._snapshot()
+        with self._lock:
+            baseline = self._baseline
+        report = {
+            "tracing": True,
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [_stat_dict(s) for s in snapshot.statistics("lineno")[:limit]],
+        }
+        if baseline is not None:
+            diff = snapshot.compare_to(baseline, "lineno")
+            report["growth_since_baseline"] = sum(s.size_diff for s in diff)
+            report["top_growth"] = [_stat_dict(s) for s in diff[:limit]]
+        return report
+
+
+def process_rss() -> Optional[int]:
+    """Current resident set size in bytes (Linux only; None elsewhere)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    import resource
+    return pages * resource.getpagesize()
+
+
+def growth_trend(samples: Iterable[tuple]) -> float:
+    """Least-squares slope of (seconds, bytes) samples, in bytes per hour"""
+    points = list(samples)
+    if len(points) < 2:
+        return 0.0
+    n = len(points)
+    mean_t = sum(t for t, _ in points) / n
+    mean_b = sum(b for _, b in points) / n
+    var = sum((t - mean_t) ** 2 for t, _ in points)
+    if var == 0:
+        return 0.0
+    slope = sum((t - mean_t) * (b - mean_b) for t, b in points) / var
+    return slope * 3600
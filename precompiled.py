@@ -0,0 +1,35 @@
+import re
+from fasthtml.common import to_xml, Safe
+
+# Placeholder text an FT builder receives where a per-render value goes.
+# It contains nothing to_xml() escapes, so it survives serialization as-is.
+_SLOT = "@@slot:{}@@"
+_SLOT_RE = re.compile(r"@@slot:(\w+)@@")
+
+
+def slot(name: str) -> str:
+    """Placeholder to pass to an FT builder in place of a per-render value"""
+    return _SLOT.format(name)
+
+
+class Template:
+    """
+    An FT tree serialized once at import, with slot() placeholders left as
+    holes. render() fills the holes by string assembly, skipping FT tree
+    construction and to_xml() on every request.
+
+    Values are inserted verbatim: escape text and attribute values with
+    html.escape() before passing them in.
+    """
+
+    def __init__(self, ft):
+        parts = _SLOT_RE.split(to_xml(ft))
+        self._literals = parts[0::2]
+        self._slots = parts[1::2]
+
+    def render(self, **values: str) -> Safe:
+        out = [self._literals[0]]
+        for name, literal in zip(self._slots, self._literals[1:]):
+            out.append(values[name])
+            out.append(literal)
+        return Safe("".join(out))
@@ -0,0 +1,82 @@
+import calendar
+from datetime import date, timedelta
+from typing import Optional
+
+# Recurrence rules stored in Task.recurrence:
+#   "daily"
+#   "weekly:mon,wed,fri"  (one or more weekdays)
+#   "monthly:31"          (that day of the month, or the month's last day if shorter)
+#   "monthly"             (older rules: the previous occurrence's day of month)
+#   "every:N"             (every N days)
+# Only the next occurrence of a rule is ever stored as a task; the one
+# after it is created when that one is completed.
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def parse_rule(rule: str):
+    """Validate a rule and return (kind, argument). Raises ValueError if malformed."""
+    kind, _, arg = rule.partition(":")
+    if kind in ("daily", "monthly") and not arg:
+        return kind, None
+    if kind == "monthly" and arg.isdigit() and 1 <= int(arg) <= 31:
+        return kind, int(arg)
+    if kind == "weekly":
+        days = sorted({WEEKDAYS.index(d.strip()) for d in arg.split(",") if d.strip() in WEEKDAYS})
+        if days and len(days) == len([d for d in arg.split(",") if d.strip()]):
+            return kind, days
+    if kind == "every" and arg.isdigit() and int(arg) > 0:
+        return kind, int(arg)
+    raise ValueError(f"Invalid recurrence rule: {rule!r}")
+
+
+def next_occurrence(rule: str, after: date, anchor: Optional[date] = None) -> date:
+    """
+    The first date strictly after `after` that the rule falls on.
+    `anchor` is the previous occurrence; monthly rules without a day keep its day of month.
+    """
+    kind, arg = parse_rule(rule)
+    if kind == "daily":
+        return after + timedelta(days=1)
+    if kind == "every":
+        return after + timedelta(days=arg)
+    if kind == "weekly":
+        for offset in range(1, 8):
+            day = after + timedelta(days=offset)
+            if day.weekday() in arg:
+                return day
+    # monthly
+    day_of_month = arg or (anchor or after).day
+    year, month = after.year, after.month
+    while True:
+        last_day = calendar.monthrange(year, month)[1]
+        candidate = date(year, month, min(day_of_month, last_day))
+        if candidate > after:
+            return candidate
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def first_occurrence(rule: str, start: date, anchor: Optional[date] = None) -> date:
+    """
+    The first date on or after `start` that the rule falls on. With an
+    `anchor` (a past occurrence), interval and monthly rules keep its cadence.
+    """
+    kind, arg = parse_rule(rule)
+    if kind == "every":
+        if anchor is None or anchor >= start:
+            return start  # Interval rules count from wherever they start
+        return anchor + timedelta(days=-(-(start - anchor).days // arg) * arg)
+    return next_occurrence(rule, start - timedelta(days=1), anchor=anchor or start)
+
+
+def describe_rule(rule: str) -> str:
+    """Human-readable label, e.g. "Weekly on Mon, Thu"."""
+    kind, arg = parse_rule(rule)
+    if kind == "daily":
+        return "Daily"
+    if kind == "monthly":
+        return f"Monthly on day {arg}" if arg else "Monthly"
+    if kind == "every":
+        return f"Every {arg} days"
+    if arg == [0, 1, 2, 3, 4]:
+        return "Every weekday"
+    return "Weekly on " + ", ".join(WEEKDAYS[d].capitalize() for d in arg)
@@ -0,0 +1,177 @@
+"""
+Replays a request trace recorded with GTD_CAPTURE_TRAFFIC against a fresh
+storage backend and reports latency percentiles per route, next to the
+latencies seen when the trace was captured.
+
+Task ids in the trace are mapped to placeholder tasks created before the
+replay starts, in order of first use, so every run issues the same
+requests. With --concurrency 1 the run is fully deterministic.
+
+Run with: python replay_traffic.py trace.jsonl --backend sqlite --speed 10 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import httpx
+
+# main builds its storage on import; keep that off ./gtd.db
+os.environ["GTD_STORAGE"] = "memory"
+import main
+from fragment_cache import FragmentCache
+from in_memory_storage import InMemoryStorage
+from singleflight import SingleFlight
+from sqlite_storage import SQLiteStorage
+
+_ID = re.compile(r"(?<=/)\d+(?=/|$)")
+
+
+def load_trace(path: str) -> List[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def make_backend(name: str, workdir: str, group_commit: bool = False):
+    if name == "sqlite":
+        return SQLiteStorage(os.path.join(workdir, "replay.db"), group_commit=group_commit)
+    if name == "memory":
+        return InMemoryStorage()
+    from columnar_storage import ColumnarStorage  # Needs numpy
+    return ColumnarStorage()
+
+
+def prepare(storage, trace: List[dict], extra_tasks: int, rng: random.Random) -> Dict[str, str]:
+    """Create the tasks the trace refers to, plus filler; returns trace id -> replay id"""
+    projects = sorted({
+        entry[part]["project"] for entry in trace for part in ("query", "form")
+        if entry[part].get("project")
+    }) or ["default"]
+    id_map: Dict[str, str] = {}
+    for entry in trace:
+        for task_id in _ID.findall(entry["path"]):
+            if task_id not in id_map:
+                task = storage.add_task({"title": f"replayed task {task_id}", "project": rng.choice(projects)})
+                id_map[task_id] = str(task.id)
+    # Filler so list views have production-like sizes, Completed included
+    now = datetime.now()
+    for i in range(extra_tasks):
+        state = rng.choices(["inbox", "active", "maybe", "completed"], weights=[3, 3, 1, 3])[0]
+        task = storage.add_task({"title": f"filler task {i}", "project": rng.choice(projects), "state": state})
+        if state == "completed":
+            storage.update_task(task.id, {"completed_at": now - timedelta(days=rng.randrange(30))})
+    return id_map
+
+
+async def replay(trace: List[dict], id_map: Dict[str, str], speed: float, concurrency: int) -> List[tuple]:
+    """Issue the trace; returns (route, latency ms, status) per request, in completion order"""
+    results = []
+    slots = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay") as client:
+
+        async def issue(entry):
+            path = _ID.sub(lambda m: id_map[m.group(0)], entry["path"])
+            async with slots:
+                started = time.perf_counter()
+                response = await client.request(
+                    entry["method"], path, params=entry["query"], data=entry["form"] or None,
+                    headers=entry["headers"],
+                )
+                results.append((entry["route"], (time.perf_counter() - started) * 1000, response.status_code))
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        first = trace[0]["t"] if trace else 0
+        pending = []
+        for entry in trace:
+            if speed > 0:
+                # Keep the trace's pacing, compressed by `speed`
+                delay = (entry["t"] - first) / speed - (loop.time() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            pending.append(asyncio.create_task(issue(entry)))
+        await asyncio.gather(*pending)
+    return results
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+
+def summarize(trace: List[dict], results: List[tuple]) -> Dict[str, dict]:
+    latencies, errors, captured = defaultdict(list), defaultdict(int), defaultdict(list)
+    for route, latency, status in results:
+        latencies[route].append(latency)
+        errors[route] += status >= 400
+    for entry in trace:
+        captured[entry["route"]].append(entry["duration_ms"])
+    summary = {}
+    for route in sorted(latencies, key=lambda r: -len(latencies[r])):
+        values = sorted(latencies[route])
+        summary[route] = {
+            "count": len(values),
+            "errors": errors[route],
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p99": percentile(values, 99),
+            "max": values[-1],
+            "captured_p50": percentile(sorted(captured[route]), 50),
+        }
+    return summary
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("trace", help="JSONL file written by GTD_CAPTURE_TRAFFIC")
+    parser.add_argument("--backend", default="sqlite", choices=["sqlite", "memory", "columnar"])
+    parser.add_argument("--group-commit", action="store_true", help="SQLite: commit writes in groups")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Multiple of the captured pace (0: as fast as concurrency allows)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum requests in flight")
+    parser.add_argument("--extra-tasks", type=int, default=0, help="Filler tasks to create before replaying")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the per-route summary to this file")
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace)
+    with tempfile.TemporaryDirectory() as workdir:
+        storage = main.storage = make_backend(args.backend, workdir, args.group_commit)
+        main.view_renders = SingleFlight(maxsize=64)
+        main.edit_form_cache = FragmentCache(maxsize=512)
+        id_map = prepare(storage, trace, args.extra_tasks, random.Random(args.seed))
+
+        async def run():
+            async with main.lifespan(main.app):
+                started = time.perf_counter()
+                results = await replay(trace, id_map, args.speed, args.concurrency)
+                return results, time.perf_counter() - started
+
+        results, elapsed = asyncio.run(run())
+        if hasattr(storage, "close"):
+            storage.close()
+
+    summary = summarize(trace, results)
+    print(f"{len(results)} requests in {elapsed:.2f}s ({len(results) / elapsed if elapsed else 0:.1f} req/s), "
+          f"backend {args.backend}, speed {args.speed}x, concurrency {args.concurrency}")
+    print(f"{'route':<28} {'count':>6} {'errors':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8} {'captured p50':>13}")
+    for route, row in summary.items():
+        print(f"{route:<28} {row['count']:>6} {row['errors']:>6} {row['p50']:>8.2f} {row['p90']:>8.2f} "
+              f"{row['p99']:>8.2f} {row['max']:>8.2f} {row['captured_p50']:>13.2f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"elapsed_s": elapsed, "routes": summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,55 @@
+import asyncio
+from typing import Any, Callable, Dict, Hashable
+
+from fragment_cache import FragmentCache
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key onto one computation, run
+    in a worker thread, and keeps recent results. Keys must include every
+    version the result depends on, so a cached result is never stale.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self.computed = 0
+        self.coalesced = 0
+        self._results = FragmentCache(maxsize)
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        result = self._results.get(key)
+        if result is not None:
+            return result
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+        else:
+            # Its own task, so the caller that started it can't cancel it for the others
+            in_flight = asyncio.ensure_future(asyncio.to_thread(compute))
+            self._in_flight[key] = in_flight
+            in_flight.add_done_callback(lambda task: self._finish(key, task))
+        # shield: a cancelled caller stops waiting, the computation carries on
+        return await asyncio.shield(in_flight)
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        del self._in_flight[key]
+        # exception() also marks a failure retrieved in case nobody was waiting
+        if not task.cancelled() and task.exception() is None:
+            self.computed += 1
+            self._results.put(key, task.result())
+
+    def clear(self):
+        """Drop kept results; computations in flight still complete for their waiters"""
+        self._results.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self._results.hits,
+            "coalesced": self.coalesced,
+            "computed": self.computed,
+            "in_flight": len(self._in_flight),
+            "size": len(self._results),
+        }
@@ -0,0 +1,141 @@
+"""
+Drives mixed add / toggle / update / view traffic through the app against
+each storage backend for a long time, sampling memory as it goes, and
+flags any backend whose memory keeps growing. The number of stored tasks
+is held steady (the oldest are deleted as new ones arrive), so a growth
+trend means something is kept per request or per write.
+
+Run with: python soak_test.py --minutes 240 --backends sqlite memory columnar
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from starlette.testclient import TestClient
+
+# main builds its storage on import; keep that off ./gtd.db
+os.environ["GTD_STORAGE"] = "memory"
+import main
+from fragment_cache import FragmentCache
+from in_memory_storage import InMemoryStorage
+from memory_diagnostics import growth_trend, process_rss
+from singleflight import SingleFlight
+from sqlite_storage import SQLiteStorage
+
+VIEWS = ["inbox", "today", "active", "maybe", "completed"]
+SCHEDULES = ["none", "today", "week", "month", "maybe"]
+PROJECTS = ["default", "work", "work/clientA", "home", "errands"]
+# Relative weight of each kind of request
+MIX = {"add": 3, "toggle": 2, "update": 2, "view": 4, "edit_form": 1}
+
+
+def make_backend(name: str, workdir: str):
+    if name == "sqlite":
+        return SQLiteStorage(os.path.join(workdir, "soak.db"))
+    if name == "memory":
+        return InMemoryStorage()
+    from columnar_storage import ColumnarStorage  # Needs numpy
+    return ColumnarStorage()
+
+
+def soak(backend_name: str, seconds: float, tasks: int, sample_every: float, warmup: float, rng: random.Random,
+         change_retention: int):
+    """
+    Run traffic against one backend. Returns (requests, samples, cache
+    occupancy), samples being (t, traced bytes, rss, storage bytes).
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        storage = main.storage = make_backend(backend_name, workdir)
+        # Tombstones pile up until the retention window is full, like a cache filling
+        storage.change_retention = change_retention
+        # Fresh caches, so one backend's renders don't count against the next
+        main.view_renders = SingleFlight(maxsize=64)
+        main.edit_form_cache = FragmentCache(maxsize=512)
+        live = [task.id for task in storage.get_tasks(state__ne="completed")]
+        requests, samples = 0, []
+        with TestClient(main.app) as client:
+            start = time.monotonic()
+            next_sample = start + warmup
+            while (now := time.monotonic()) - start < seconds:
+                kind = rng.choices(list(MIX), weights=list(MIX.values()))[0]
+                if kind == "add" or not live:
+                    version = storage.get_version()
+                    client.post("/add-task", data={"title": f"soak task {requests}", "project": rng.choice(PROJECTS)})
+                    live.extend(task.id for task in storage.get_changes(version)[1])
+                    while len(live) > tasks:
+                        storage.delete_task(live.pop(0))
+                elif kind == "toggle":
+                    client.post(f"/toggle-task-complete/{rng.choice(live)}", headers={"hx-current-url": "http://soak/?view=inbox"})
+                elif kind == "update":
+                    client.put(f"/update-task/{rng.choice(live)}", data={
+                        "title": f"updated {requests}", "schedule": rng.choice(SCHEDULES), "project": rng.choice(PROJECTS),
+                    })
+                elif kind == "view":
+                    if rng.random() < 0.2:
+                        client.get("/tasks", params={"project": rng.choice(PROJECTS[1:])})
+                    else:
+                        client.get("/tasks", params={"view": rng.choice(VIEWS)})
+                else:
+                    client.get(f"/get-task-data/{rng.choice(live)}")
+                requests += 1
+                if now >= next_sample:
+                    gc.collect()
+                    traced = tracemalloc.get_traced_memory()[0]
+                    samples.append((now - start, traced, process_rss() or 0, storage.memory_footprint()["bytes"]))
+                    next_sample = now + sample_every
+            # Bounded caches still filling up also read as growth
+            caches = (f"view renders {main.view_renders.stats()['size']}/{main.view_renders.maxsize}, "
+                      f"edit forms {len(main.edit_form_cache)}/{main.edit_form_cache.maxsize}")
+        if hasattr(storage, "close"):
+            storage.close()
+        return requests, samples, caches
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--minutes", type=float, default=60, help="Duration per backend")
+    parser.add_argument("--backends", nargs="+", default=["sqlite", "memory", "columnar"],
+                        choices=["sqlite", "memory", "columnar"])
+    parser.add_argument("--tasks", type=int, default=500, help="Stored tasks to hold steady at")
+    parser.add_argument("--sample-every", type=float, default=10, help="Seconds between memory samples")
+    parser.add_argument("--warmup", type=float, default=None,
+                        help="Seconds before sampling starts, while caches fill (default: 10%% of the run)")
+    parser.add_argument("--change-retention", type=int, default=1000,
+                        help="Change-log versions tombstones are kept for; small so the window fills during warm-up")
+    parser.add_argument("--max-growth-mb-per-hour", type=float, default=1.0,
+                        help="Traced-memory trend above which a backend is flagged")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    seconds = args.minutes * 60
+    warmup = seconds * 0.1 if args.warmup is None else args.warmup
+    tracemalloc.start()
+    flagged = []
+    for name in args.backends:
+        requests, samples, caches = soak(name, seconds, args.tasks, args.sample_every, warmup, random.Random(args.seed),
+                                         args.change_retention)
+        traced_trend = growth_trend((t, traced) for t, traced, _, _ in samples) / 2**20
+        rss_trend = growth_trend((t, rss) for t, _, rss, _ in samples) / 2**20
+        storage_trend = growth_trend((t, size) for t, _, _, size in samples) / 2**20
+        growing = len(samples) >= 3 and traced_trend > args.max_growth_mb_per_hour
+        if growing:
+            flagged.append(name)
+        first, last = (samples[0], samples[-1]) if samples else ((0, 0, 0, 0),) * 2
+        print(f"{name:<9} {requests / seconds:7.1f} req/s  {len(samples)} samples  "
+              f"traced {first[1] / 2**20:.1f} -> {last[1] / 2**20:.1f} MB ({traced_trend:+.2f} MB/h)  "
+              f"rss {rss_trend:+.2f} MB/h  storage {storage_trend:+.2f} MB/h  "
+              f"{'GROWING' if growing else 'ok'}")
+        print(f"{'':<9} caches at end: {caches}")
+    if flagged:
+        print(f"Memory keeps growing for: {', '.join(flagged)}. Compare /debug/memory top_growth (GTD_DEBUG_MEMORY=1) "
+              f"against a baseline taken after warm-up to find where.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
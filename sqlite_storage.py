@@ -1,19 +1,143 @@
-from storage_interface import IStorage, Task
-from typing import List, Dict, Any, Optional
+from storage_interface import (
+    IStorage, Task, ArchivedTask, TaskChange, DailyStat, SEED_TASKS, AnyOf, parse_filter, wants_archived, materialize_filters, task_path,
+)
+from analytics import StatDeltas, stat_deltas, backfill
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from datetime import datetime, date
-from sqlmodel import create_engine, Session, select, SQLModel
+from concurrent.futures import Future
+import queue
+import threading
+import time
+from sqlmodel import create_engine, Session, select, SQLModel, delete, update, func, and_, or_
+from sqlalchemy import String, inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from pathlib import Path
 
 class SQLiteStorage(IStorage):
-    def __init__(self, db_path: str = "gtd.db"):
+    def __init__(self, db_path: str = "gtd.db", group_commit: bool = False, commit_window: float = 0.005,
+                 today: Callable[[], date] = date.today):
+        """
+        :param group_commit: Route writes through a single writer thread that
+                             commits them in groups (see _GroupCommitWriter).
+        :param commit_window: Seconds the writer waits to gather a group.
+        :param today: Returns the day rollup inbox counts go to (the app passes its day clock).
+        """
         self.db_path = db_path
+        self._today = today
+        self._pruned_to = 0  # Change-log version up to which tombstones were pruned
         self.engine = create_engine(f"sqlite:///{db_path}")
         self._create_database()
         self._seed_data()
+        self._writer = None
+        if group_commit:
+            # WAL lets reads proceed while the writer holds its transaction
+            with self.engine.connect() as conn:
+                conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+            self._writer = _GroupCommitWriter(self.engine, commit_window)
+        with Session(self.engine) as session:
+            if session.exec(select(DailyStat)).first() is None:
+                self.rebuild_daily_stats()  # Backfill rollups for existing history
 
     def _create_database(self):
         """Create database tables if they don't exist"""
         SQLModel.metadata.create_all(self.engine)
+        self._add_missing_columns()
+        self._use_autoincrement()
+        self._backfill_paths()
+        # create_all skips indexes on tables that already exist
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(self.engine, checkfirst=True)
+        self._backfill_change_log()
+
+    def _add_missing_columns(self):
+        """Add columns introduced since the database was created (all are nullable)"""
+        inspector = inspect(self.engine)
+        with self.engine.begin() as conn:
+            for table in SQLModel.metadata.sorted_tables:
+                existing = {column["name"] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        column_type = column.type.compile(dialect=self.engine.dialect)
+                        conn.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+
+    def _use_autoincrement(self):
+        """
+        Rebuild a task table created before AUTOINCREMENT: without it SQLite
+        hands out max(id)+1, so archiving the newest task frees its id for
+        reuse. Also starts the id sequence past every archived id.
+        """
+        with self.engine.begin() as conn:
+            sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type='table' AND name='task'").scalar()
+            if "AUTOINCREMENT" not in sql.upper():
+                columns = ", ".join(f'"{c.name}"' for c in Task.__table__.columns)
+                conn.exec_driver_sql("ALTER TABLE task RENAME TO task_old")
+                # The old indexes moved with the table; their names are needed for the new one
+                for (name,) in conn.exec_driver_sql(
+                    "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='task_old' AND sql IS NOT NULL"
+                ).all():
+                    conn.exec_driver_sql(f'DROP INDEX "{name}"')
+                Task.__table__.create(conn)
+                conn.exec_driver_sql(f"INSERT INTO task ({columns}) SELECT {columns} FROM task_old")
+                conn.exec_driver_sql("DROP TABLE task_old")
+            highest = conn.exec_driver_sql(
+                "SELECT max(coalesce((SELECT max(id) FROM task), 0), coalesce((SELECT max(id) FROM archived_task), 0))"
+            ).scalar()
+            # Archived tasks whose id an older version already handed out again get a fresh one
+            collisions = [row[0] for row in conn.exec_driver_sql(
+                "SELECT id FROM archived_task WHERE id IN (SELECT id FROM task) ORDER BY id"
+            ).all()]
+            for old_id in collisions:
+                highest += 1
+                conn.exec_driver_sql("UPDATE archived_task SET id = ?, path = ? WHERE id = ?", (highest, task_path(highest), old_id))
+                conn.exec_driver_sql("INSERT INTO task_change (task_id, deleted, changed_at) VALUES (?, 0, ?)", (highest, datetime.now()))
+            conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'task'")
+            conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES ('task', ?)", (highest,))
+
+    def _backfill_paths(self):
+        """Tasks stored before subtasks existed are roots: their path is just their id"""
+        with Session(self.engine) as session:
+            for model in (Task, ArchivedTask):
+                session.exec(
+                    update(model).where(model.path.is_(None))
+                    .values(path=func.cast(model.id, String) + "/")
+                )
+            session.commit()
+
+    def _backfill_change_log(self):
+        """Log every existing task once, for databases created before the change log"""
+        with Session(self.engine) as session:
+            if session.exec(select(TaskChange)).first() is not None:
+                return
+            for model in (Task, ArchivedTask):
+                for task_id, updated_at in session.exec(select(model.id, model.updated_at)).all():
+                    session.add(TaskChange(task_id=task_id, changed_at=updated_at))
+            session.commit()
+
+    def _log_change(self, session: Session, task_id: int, deleted: bool = False):
+        """Record the latest change to a task, replacing its previous entry"""
+        session.exec(delete(TaskChange).where(TaskChange.task_id == task_id))
+        session.add(TaskChange(task_id=task_id, deleted=deleted))
+
+    def _prune_tombstones(self, session: Session):
+        """Drop tombstones past the retention horizon (see get_change_horizon())"""
+        horizon = (session.exec(select(func.max(TaskChange.version))).one() or 0) - self.change_retention
+        if horizon > self._pruned_to:
+            # Only the versions that aged out since the last prune are scanned
+            session.exec(delete(TaskChange).where(
+                TaskChange.deleted == True, TaskChange.version > self._pruned_to, TaskChange.version <= horizon
+            ))
+            self._pruned_to = horizon
+
+    def _apply_stats(self, session: Session, deltas: StatDeltas):
+        """Add rollup deltas in place; upserts keep concurrent writers from losing counts"""
+        table = DailyStat.__table__
+        for (day, project), fields in deltas.items():
+            statement = sqlite_insert(table).values(day=day, project=project, **fields).on_conflict_do_update(
+                index_elements=["day", "project"],
+                set_={field: table.c[field] + value for field, value in fields.items()},
+            )
+            session.exec(statement)
 
     def _seed_data(self):
         """Seed initial data if database is empty"""
@@ -21,88 +145,198 @@ class SQLiteStorage(IStorage):
             # Check if database is empty
             existing_tasks = session.exec(select(Task)).first()
             if existing_tasks is None:
-                # Seed some dummy tasks (same as in_memory_storage.py)
-                seed_tasks = [
-                    Task(title="create datasets management webapp", due_date=date(2025, 7, 7), project="maybe", schedule="today", state="inbox"),
-                    Task(title="create local docker repository", project="maybe", state="inbox"),
-                    Task(title="basketball player tracking: get detections without NMS", project="maybe", state="inbox"),
-                    Task(title="generic framework for resuming processes after power fail/restart", due_date=date(2025, 7, 11), project="next", schedule="week", state="active"),
-                    Task(title="joint ball and carrier detection", state="inbox"),
-                    Task(title="Vollyball total match count", due_date=date(2025, 9, 15), project="maybe", state="inbox"),
-                    Task(title="Ball carrier filter", due_date=date(2025, 9, 22), project="next", state="inbox"),
-                ]
+                seed_tasks = [Task(**task_data) for task_data in SEED_TASKS]
                 for task in seed_tasks:
                     session.add(task)
+                session.flush()
+                for task in seed_tasks:
+                    task.path = task_path(task.id)
+                    self._log_change(session, task.id)
                 session.commit()
 
-    def get_tasks(self, **filters: Any) -> List[Task]:
+    @staticmethod
+    def _condition(model, key: str, value: Any):
+        """Translate one filter into a WHERE clause the column index can serve"""
+        field, op = parse_filter(key)
+        column = getattr(model, field)
+        if op == "eq":
+            return column == value
+        if op == "ne":
+            if value is None:
+                return column.is_not(None)
+            # SQL's NULL != value is never true; missing values differ from any value
+            return or_(column != value, column.is_(None))
+        if op == "in":
+            values = [v for v in value if v is not None]
+            return or_(column.in_(values), column.is_(None)) if None in value else column.in_(values)
+        if op == "isnull":
+            return column.is_(None) if value else column.is_not(None)
+        if op == "startswith":
+            if not value:
+                return column.is_not(None)
+            # A range rather than LIKE 'prefix%', so the column index serves it
+            return and_(column >= value, column < value[:-1] + chr(ord(value[-1]) + 1))
+        if op == "lt":
+            return column < value
+        if op == "lte":
+            return column <= value
+        if op == "gt":
+            return column > value
+        return column >= value
+
+    def _where(self, model, filters: Dict[str, Any], any_of: Tuple[AnyOf, ...] = ()) -> list:
+        clauses = [self._condition(model, key, value) for key, value in filters.items()]
+        for group in any_of:
+            clauses.append(or_(*(
+                and_(*(self._condition(model, key, value) for key, value in alt.items()))
+                for alt in group.alternatives
+            )))
+        return clauses
+
+    def get_tasks(self, *any_of: AnyOf, **filters: Any) -> List[Task]:
+        filters = materialize_filters(filters)
         with Session(self.engine) as session:
-            statement = select(Task)
-            
-            # Apply filters (including __ne support)
-            for key, value in filters.items():
-                if key.endswith('__ne'):
-                    attr_name = key[:-4]  # Remove '__ne'
-                    statement = statement.where(getattr(Task, attr_name) != value)
-                else:
-                    statement = statement.where(getattr(Task, key) == value)
-            
-            return list(session.exec(statement).all())
+            tasks = list(session.exec(select(Task).where(*self._where(Task, filters, any_of))).all())
+            if wants_archived(filters, any_of):
+                archived = session.exec(
+                    select(ArchivedTask).where(*self._where(ArchivedTask, filters, any_of))
+                ).all()
+                tasks.extend(Task(**a.model_dump()) for a in archived)
+            return tasks
 
-    def add_task(self, task_data: Dict[str, Any]) -> Task:
+    def count_tasks(self, *any_of: AnyOf, **filters: Any) -> int:
+        filters = materialize_filters(filters)
+        with Session(self.engine) as session:
+            count = session.exec(
+                select(func.count()).select_from(Task).where(*self._where(Task, filters, any_of))
+            ).one()
+            if wants_archived(filters, any_of):
+                count += session.exec(
+                    select(func.count()).select_from(ArchivedTask)
+                    .where(*self._where(ArchivedTask, filters, any_of))
+                ).one()
+            return count
+
+    def count_open_tasks_by_project(self) -> Dict[str, int]:
         with Session(self.engine) as session:
+            statement = (
+                select(Task.project, func.count())
+                .where(Task.state != "completed")
+                .group_by(Task.project)
+            )
+            return dict(session.exec(statement).all())
+
+    def _write(self, mutation: Callable[[Session], Any]) -> Any:
+        """Run a write against a session and commit it, possibly grouped with others"""
+        if self._writer is not None:
+            return self._writer.submit(mutation).result()
+        with Session(self.engine, expire_on_commit=False) as session:
+            result = mutation(session)
+            session.commit()
+            return result
+
+    def close(self):
+        """Stop the writer thread (if any) after draining pending writes"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def add_task(self, task_data: Dict[str, Any]) -> Task:
+        def mutation(session: Session) -> Task:
+            parent = None
+            if task_data.get("parent_id") is not None:
+                parent = session.get(Task, task_data["parent_id"]) or session.get(ArchivedTask, task_data["parent_id"])
+                if parent is None:
+                    raise ValueError(f"Unknown parent task: {task_data['parent_id']}")
             now = datetime.now()
             new_task = Task(
                 title=task_data.get("title", "Untitled Task"),
                 description=task_data.get("description"),
                 state=task_data.get("state", "inbox"),
                 schedule=task_data.get("schedule"),
+                recurrence=task_data.get("recurrence"),
                 due_date=task_data.get("due_date"),
                 project=task_data.get("project", "default"),
+                parent_id=parent.id if parent else None,
                 completed_at=None,
                 created_at=now,
                 updated_at=now,
             )
             
             session.add(new_task)
-            session.commit()
-            session.refresh(new_task)
+            session.flush()  # Assigns the id
+            new_task.path = task_path(new_task.id, parent)
+            self._log_change(session, new_task.id)
+            self._apply_stats(session, stat_deltas(None, new_task, self._today()))
             return new_task
+        return self._write(mutation)
 
     def get_task_by_id(self, task_id: int) -> Optional[Task]:
         with Session(self.engine) as session:
-            statement = select(Task).where(Task.id == task_id)
-            return session.exec(statement).first()
+            task = session.get(Task, task_id)
+            if task is None:
+                archived = session.get(ArchivedTask, task_id)
+                if archived is not None:
+                    task = Task(**archived.model_dump())
+            return task
 
     def update_task(self, task_id: int, update_data: Dict[str, Any]) -> Optional[Task]:
-        with Session(self.engine) as session:
-            statement = select(Task).where(Task.id == task_id)
-            task = session.exec(statement).first()
+        return self._write(lambda session: self._update(session, task_id, update_data))
+
+    def update_many(self, updates: Dict[int, Dict[str, Any]]) -> int:
+        def mutation(session: Session) -> int:
+            return sum(self._update(session, task_id, data) is not None for task_id, data in updates.items())
+        return self._write(mutation)
+
+    def _update(self, session: Session, task_id: int, update_data: Dict[str, Any]) -> Optional[Task]:
+        """Apply one update within a write (shared by update_task and update_many)"""
+        task = session.get(Task, task_id)
+        if task is None:
+            task = session.get(ArchivedTask, task_id)
+        
+        if task:
+            old = Task(**task.model_dump())
+            for key, value in update_data.items():
+                if key in ["id", "created_at", "parent_id", "path"]:
+                    continue  # Don't update these fields
+                if hasattr(task, key):
+                    setattr(task, key, value)
             
-            if task:
-                for key, value in update_data.items():
-                    if key in ["id", "created_at"]:
-                        continue  # Don't update these fields
-                    if hasattr(task, key):
-                        setattr(task, key, value)
-                
-                task.updated_at = datetime.now()
-                session.add(task)
-                session.commit()
-                session.refresh(task)
-                return task
-            return None
+            task.updated_at = datetime.now()
+            if isinstance(task, ArchivedTask):
+                if task.state == "completed":
+                    session.add(task)
+                    self._log_change(session, task_id)
+                    self._apply_stats(session, stat_deltas(old, Task(**task.model_dump()), self._today()))
+                    return Task(**task.model_dump())
+                task = self._restore(session, task)
+            session.add(task)
+            session.flush()
+            self._log_change(session, task.id)
+            self._apply_stats(session, stat_deltas(old, task, self._today()))
+            return task
+        return None
+
+    def _restore(self, session: Session, archived: ArchivedTask) -> Task:
+        """Move a reopened task from the archive back into the Task table"""
+        task = Task(**archived.model_dump())
+        session.delete(archived)
+        return task
 
     def delete_task(self, task_id: int) -> bool:
-        with Session(self.engine) as session:
-            statement = select(Task).where(Task.id == task_id)
-            task = session.exec(statement).first()
+        def mutation(session: Session) -> bool:
+            task = session.get(Task, task_id)
+            if task is None:
+                task = session.get(ArchivedTask, task_id)
             
             if task:
                 session.delete(task)
-                session.commit()
+                self._log_change(session, task_id, deleted=True)
+                self._prune_tombstones(session)
+                self._apply_stats(session, stat_deltas(Task(**task.model_dump()), None, self._today()))
                 return True
             return False
+        return self._write(mutation)
 
     def get_projects(self) -> List[str]:
         with Session(self.engine) as session:
@@ -110,5 +344,141 @@ class SQLiteStorage(IStorage):
             projects = session.exec(statement).all()
             return sorted(list(projects))
 
-# Initialize the SQLite storage
-storage = SQLiteStorage()
\ No newline at end of file
+    def archive_completed_tasks(self, completed_before: datetime, batch_size: int = 500) -> int:
+        def mutation(session: Session) -> int:
+            statement = (
+                select(Task)
+                .where(Task.state == "completed", Task.completed_at < completed_before)
+                .limit(batch_size)
+            )
+            batch = session.exec(statement).all()
+            for task in batch:
+                session.add(ArchivedTask(**task.model_dump()))
+                session.delete(task)
+            return len(batch)
+        return self._write(mutation)
+
+    def get_daily_stats(self, start: date, end: date) -> List[DailyStat]:
+        with Session(self.engine) as session:
+            statement = select(DailyStat).where(DailyStat.day >= start, DailyStat.day <= end)
+            return list(session.exec(statement).all())
+
+    def rebuild_daily_stats(self) -> int:
+        def mutation(session: Session) -> int:
+            def all_tasks():
+                # Stream rows so backfilling a large history stays flat in memory
+                yield from session.exec(select(Task).execution_options(yield_per=1000))
+                for archived in session.exec(select(ArchivedTask).execution_options(yield_per=1000)):
+                    yield Task(**archived.model_dump())
+            stats = backfill(all_tasks())
+            session.exec(delete(DailyStat))
+            for (day, project), fields in stats.items():
+                session.add(DailyStat(day=day, project=project, **fields))
+            return len(stats)
+        return self._write(mutation)
+
+    def memory_footprint(self) -> Dict[str, int]:
+        # Task data lives in the database file; report its allocated pages
+        with self.engine.connect() as conn:
+            page_count = conn.exec_driver_sql("PRAGMA page_count").scalar()
+            page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+        tasks = self.count_tasks(state__ne="completed") + self.count_tasks(state="completed")
+        return {"tasks": tasks, "bytes": page_count * page_size}
+
+    def get_version(self) -> int:
+        with Session(self.engine) as session:
+            return session.exec(select(func.max(TaskChange.version))).one() or 0
+
+    def get_changes(self, since: int = 0) -> Tuple[int, List[Task], List[int]]:
+        with Session(self.engine) as session:
+            version = session.exec(select(func.max(TaskChange.version))).one() or 0
+            in_range = (TaskChange.version > since, TaskChange.version <= version)
+            tasks = list(session.exec(
+                select(Task).join(TaskChange, TaskChange.task_id == Task.id)
+                .where(*in_range, TaskChange.deleted == False)
+            ).all())
+            archived = session.exec(
+                select(ArchivedTask).join(TaskChange, TaskChange.task_id == ArchivedTask.id)
+                .where(*in_range, TaskChange.deleted == False)
+            ).all()
+            tasks.extend(Task(**a.model_dump()) for a in archived)
+            deleted = session.exec(
+                select(TaskChange.task_id).where(*in_range, TaskChange.deleted == True)
+            ).all()
+            return version, tasks, list(deleted)
+
+
+class _GroupCommitWriter:
+    """
+    Single writer thread that owns the write connection. Mutations queued
+    within `commit_window` seconds of each other share one transaction, so
+    a burst of writes costs one fsync instead of one per write.
+    """
+
+    def __init__(self, engine, commit_window: float = 0.005, max_batch: int = 256):
+        self.engine = engine
+        self.commit_window = commit_window
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[Tuple[Callable[[Session], Any], Future]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="sqlite-group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, mutation: Callable[[Session], Any]) -> Future:
+        future: Future = Future()
+        self._queue.put((mutation, future))
+        return future
+
+    def close(self):
+        self._queue.put(None)  # Sentinel: finish what's queued, then exit
+        self._thread.join()
+
+    def _next_batch(self) -> Optional[List[Tuple[Callable[[Session], Any], Future]]]:
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.commit_window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # Let the next _next_batch() see it
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        with Session(self.engine, expire_on_commit=False) as session:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                try:
+                    results = [mutation(session) for mutation, _ in batch]
+                    session.commit()
+                except Exception:
+                    session.rollback()
+                    session.expunge_all()
+                    # One bad write must not fail the whole group: retry each alone
+                    for mutation, future in batch:
+                        self._run_alone(session, mutation, future)
+                else:
+                    for (_, future), result in zip(batch, results):
+                        future.set_result(result)
+                session.expunge_all()
+
+    def _run_alone(self, session: Session, mutation: Callable[[Session], Any], future: Future):
+        try:
+            result = mutation(session)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        session.expunge_all()
@@ -1,24 +1,156 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from pydantic import BaseModel, Field
 from datetime import datetime, date
+import operator
 from sqlmodel import SQLModel, Field as SQLField
 
-# SQLModel/Pydantic model for Task data transfer
-class Task(SQLModel, table=True):
+# Shared columns for the hot (Task) and cold (ArchivedTask) tables
+class TaskBase(SQLModel):
     # 'id' is Optional for new tasks, but will be set once stored.
     # It's here for consistency when retrieving tasks.
     id: Optional[int] = SQLField(default=None, primary_key=True)
     title: str
     description: Optional[str] = None
-    state: str = "inbox"  # inbox | active | maybe | completed
+    state: str = SQLField(default="inbox", index=True)  # inbox | active | maybe | completed
     schedule: Optional[str] = None # today | week | month
-    due_date: Optional[date] = None
-    project: str = "default" # Default to "default" as per spec
-    completed_at: Optional[datetime] = None
+    recurrence: Optional[str] = SQLField(default=None, index=True) # Rule, see recurrence.py
+    due_date: Optional[date] = SQLField(default=None, index=True)
+    project: str = SQLField(default="default", index=True) # Default to "default"; "/" nests, e.g. "work/clientA"
+    parent_id: Optional[int] = SQLField(default=None, index=True) # Set for subtasks, fixed at creation
+    path: Optional[str] = SQLField(default=None, index=True) # Ids from the root task down, e.g. "3/17/"
+    completed_at: Optional[datetime] = SQLField(default=None, index=True)
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
 
+# SQLModel/Pydantic model for Task data transfer
+class Task(TaskBase, table=True):
+    # AUTOINCREMENT keeps ids of archived tasks from being handed out again
+    __table_args__ = {"sqlite_autoincrement": True}
+
+# Completed tasks moved out of the working set by the archiver.
+# Rows keep the id they had in the Task table.
+class ArchivedTask(TaskBase, table=True):
+    __tablename__ = "archived_task"
+
+# One row per task: the latest change to it. Versions only ever grow, so
+# clients can ask for everything after the version they last saw.
+class TaskChange(SQLModel, table=True):
+    __tablename__ = "task_change"
+    __table_args__ = {"sqlite_autoincrement": True}
+    version: Optional[int] = SQLField(default=None, primary_key=True)
+    task_id: int = SQLField(index=True)
+    deleted: bool = False  # Tombstone
+    changed_at: datetime = Field(default_factory=datetime.now)
+
+# Productivity counters per day and project, kept up to date by every write
+# (see analytics.py) so reports never scan the task tables.
+class DailyStat(SQLModel, table=True):
+    __tablename__ = "daily_stat"
+    day: date = SQLField(primary_key=True)
+    project: str = SQLField(primary_key=True)
+    created: int = 0
+    completed: int = 0
+    inbox_in: int = 0
+    inbox_out: int = 0
+    lead_time_seconds: float = 0  # Sum of created_at -> completed_at over completions
+
+# Suffixes understood by get_tasks(), e.g. due_date__lt=date.today()
+FILTER_OPERATORS = ("ne", "in", "lt", "lte", "gt", "gte", "isnull", "startswith")
+
+# Change-log versions a tombstone is kept for. Clients that last synced
+# before that horizon can't be told about every deletion and must resync.
+CHANGE_LOG_RETENTION = 10_000
+
+# Dummy tasks every backend starts an empty store with
+SEED_TASKS: List[Dict[str, Any]] = [
+    {"title": "create datasets management webapp", "due_date": date(2025, 7, 7), "project": "maybe", "schedule": "today", "state": "inbox"},
+    {"title": "create local docker repository", "project": "maybe", "state": "inbox"},
+    {"title": "basketball player tracking: get detections without NMS", "project": "maybe", "state": "inbox"},
+    {"title": "generic framework for resuming processes after power fail/restart", "due_date": date(2025, 7, 11), "project": "next", "schedule": "week", "state": "active"},
+    {"title": "joint ball and carrier detection", "state": "inbox"},
+    {"title": "Vollyball total match count", "due_date": date(2025, 9, 15), "project": "maybe", "state": "inbox"},
+    {"title": "Ball carrier filter", "due_date": date(2025, 9, 22), "project": "next", "state": "inbox"},
+]
+
+# Separates levels of a project name: "work/clientA/q3" is inside "work/clientA"
+PROJECT_SEPARATOR = "/"
+
+class AnyOf:
+    """
+    An OR group for get_tasks(): matches a task if any one of the filter
+    dicts matches it, e.g. AnyOf({"state": "active"}, {"due_date__isnull": False}).
+    """
+    def __init__(self, *alternatives: Dict[str, Any]):
+        self.alternatives = tuple(materialize_filters(alt) for alt in alternatives)
+
+def materialize_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn __in values into tuples, so a one-shot iterable (e.g. a generator)
+    can be read more than once. Backends call this on entry to get_tasks().
+    """
+    return {key: tuple(value) if key.endswith("__in") else value for key, value in filters.items()}
+
+def parse_filter(key: str) -> Tuple[str, str]:
+    """Split a filter key into (field, operator); a bare field means equality."""
+    field, _, op = key.rpartition("__")
+    if not field or op not in FILTER_OPERATORS:
+        field, op = key, "eq"
+    if field not in TaskBase.model_fields:
+        raise ValueError(f"Unknown task field in filter: {key}")
+    return field, op
+
+# Operators that are plain comparisons; the functions work on NumPy columns too
+COMPARISON_OPERATORS = {
+    "eq": operator.eq, "ne": operator.ne, "lt": operator.lt, "lte": operator.le, "gt": operator.gt, "gte": operator.ge,
+}
+
+def value_predicate(op: str, value: Any) -> Callable[[Any], bool]:
+    """
+    Test one field value against a filter operator, with the semantics
+    get_tasks() documents. Backends that filter in Python share it.
+    """
+    if op == "eq":
+        return lambda v: v == value
+    if op == "ne":
+        return lambda v: v != value
+    if op == "in":
+        return lambda v: v in value
+    if op == "isnull":
+        return lambda v: (v is None) == bool(value)
+    if op == "startswith":
+        return lambda v: v is not None and v.startswith(value)
+    compare = COMPARISON_OPERATORS[op]
+    return lambda v: v is not None and compare(v, value)
+
+def task_path(task_id: int, parent: Optional["TaskBase"] = None) -> str:
+    """Materialized path of a task: its parent's path plus its own id"""
+    return f"{parent.path if parent else ''}{task_id}/"
+
+def project_subtree(project: str) -> AnyOf:
+    """get_tasks() filter matching a project and every project nested in it"""
+    return AnyOf({"project": project}, {"project__startswith": project + PROJECT_SEPARATOR})
+
+def rollup_project_counts(counts: Dict[str, int]) -> Dict[str, int]:
+    """
+    Add each project's count to all of its ancestors, so "work" includes
+    "work/clientA". Ancestors without tasks of their own are included.
+    Works on the distinct project names only, never on tasks.
+    """
+    rolled: Dict[str, int] = {}
+    for project, count in counts.items():
+        parts = project.split(PROJECT_SEPARATOR)
+        for depth in range(1, len(parts) + 1):
+            ancestor = PROJECT_SEPARATOR.join(parts[:depth])
+            rolled[ancestor] = rolled.get(ancestor, 0) + count
+    return rolled
+
+def wants_archived(filters: Dict[str, Any], any_of: Tuple[AnyOf, ...] = ()) -> bool:
+    """Whether a get_tasks() filter set can match archived (completed) tasks."""
+    if filters.get("state") == "completed" or "completed" in filters.get("state__in", ()):
+        return True
+    return any(wants_archived(alt) for group in any_of for alt in group.alternatives)
+
 # Abstract Base Class for the Storage Adapter
 class IStorage(ABC):
     """
@@ -27,31 +159,97 @@ class IStorage(ABC):
     (e.g., in-memory, database).
     """
 
+    # Versions a tombstone is kept for; an instance may set its own
+    change_retention: int = CHANGE_LOG_RETENTION
+
     @abstractmethod
-    def get_tasks(self, **filters: Any) -> List[Task]:
+    def get_tasks(self, *any_of: AnyOf, **filters: Any) -> List[Task]:
         """
         Retrieves a list of tasks, optionally filtered by given criteria.
+        Archived tasks are included when filtering on state="completed".
+        
+        A filter key is a field name, optionally followed by one of the
+        FILTER_OPERATORS: __ne, __in (any iterable), __lt/__lte/__gt/__gte,
+        __isnull (True/False) and __startswith (string prefix). A missing
+        (None) value matches __ne of any other value and __in when the
+        values include None; the other comparisons never match it. All
+        conditions must hold.
         
+        :param any_of: OR groups, each of which must also match.
         :param filters: Keyword arguments for filtering (e.g., state="inbox").
         :return: A list of Task objects.
         """
         pass
 
+    def count_tasks(self, *any_of: AnyOf, **filters: Any) -> int:
+        """
+        Counts the tasks get_tasks() would return for the same filters.
+        Backends override this to count without building Task objects.
+        
+        :return: The number of matching tasks.
+        """
+        return len(self.get_tasks(*any_of, **filters))
+
+    def count_open_tasks_by_project(self) -> Dict[str, int]:
+        """
+        Counts the non-completed tasks in each project.
+        
+        :return: A dictionary mapping project name to its open task count.
+        """
+        counts: Dict[str, int] = {}
+        for task in self.get_tasks(state__ne="completed"):
+            counts[task.project] = counts.get(task.project, 0) + 1
+        return counts
+
+    def count_open_tasks_by_project_tree(self) -> Dict[str, int]:
+        """
+        Counts the non-completed tasks in each project, including those in
+        projects nested inside it.
+        
+        :return: A dictionary mapping project name to its rolled-up open task count.
+        """
+        return rollup_project_counts(self.count_open_tasks_by_project())
+
+    def get_subtree(self, task_id: int) -> List[Task]:
+        """
+        Retrieves a task and all of its subtasks, at any depth, from the
+        working set. Backends serve this as a prefix range over Task.path.
+        
+        :param task_id: The ID of the root task.
+        :return: The task followed by its descendants (empty if not found).
+        """
+        task = self.get_task_by_id(task_id)
+        if task is None or task.path is None:
+            return []
+        return sorted(self.get_tasks(path__startswith=task.path), key=lambda t: t.path)
+
+    @abstractmethod
+    def memory_footprint(self) -> Dict[str, int]:
+        """
+        Estimates what the backend holds for its task data, for memory
+        diagnostics.
+        
+        :return: {"tasks": tasks stored (archived included), "bytes": estimated size}
+        """
+        pass
+
     @abstractmethod
     def add_task(self, task_data: Dict[str, Any]) -> Task:
         """
-        Adds a new task to the storage.
+        Adds a new task to the storage. A 'parent_id' makes it a subtask;
+        its path is derived from the parent's.
         
         :param task_data: A dictionary containing the new task's data.
                           Must include 'title'.
         :return: The newly created Task object, including its ID.
+        :raises ValueError: If 'parent_id' names a task that does not exist.
         """
         pass
 
     @abstractmethod
     def get_task_by_id(self, task_id: int) -> Optional[Task]:
         """
-        Retrieves a single task by its ID.
+        Retrieves a single task by its ID, looking in the archive as well.
         
         :param task_id: The ID of the task to retrieve.
         :return: A Task object if found, otherwise None.
@@ -61,19 +259,31 @@ class IStorage(ABC):
     @abstractmethod
     def update_task(self, task_id: int, update_data: Dict[str, Any]) -> Optional[Task]:
         """
-        Updates an existing task.
+        Updates an existing task. Reopening an archived task (setting a
+        state other than "completed") moves it back into the working set.
         
         :param task_id: The ID of the task to update.
         :param update_data: A dictionary with the fields to update.
-                           Must not include 'id', 'created_at'.
+                           'id', 'created_at', 'parent_id' and 'path'
+                           are ignored.
         :return: The updated Task object if found, otherwise None.
         """
         pass
 
+    def update_many(self, updates: Dict[int, Dict[str, Any]]) -> int:
+        """
+        Applies several updates as one batch, with update_task() semantics
+        for each. Backends override this to apply them in one transaction.
+        
+        :param updates: A dictionary mapping task ID to its update_data.
+        :return: The number of tasks found and updated.
+        """
+        return sum(self.update_task(task_id, data) is not None for task_id, data in updates.items())
+
     @abstractmethod
     def delete_task(self, task_id: int) -> bool:
         """
-        Deletes a task.
+        Deletes a task, whether it is in the working set or archived.
         
         :param task_id: The ID of the task to delete.
         :return: True if deletion was successful, False otherwise.
@@ -83,8 +293,72 @@ class IStorage(ABC):
     @abstractmethod
     def get_projects(self) -> List[str]:
         """
-        Retrieves a list of all unique project names.
+        Retrieves a list of all unique project names in the working set.
         
         :return: A list of strings, where each string is a unique project name.
         """
         pass
+
+    @abstractmethod
+    def archive_completed_tasks(self, completed_before: datetime, batch_size: int = 500) -> int:
+        """
+        Moves up to `batch_size` tasks completed before `completed_before`
+        out of the working set into the archive.
+        
+        :param completed_before: Tasks completed before this moment are archived.
+        :param batch_size: Maximum number of tasks to move in this call.
+        :return: The number of tasks archived.
+        """
+        pass
+
+    @abstractmethod
+    def get_daily_stats(self, start: date, end: date) -> List[DailyStat]:
+        """
+        Retrieves the daily rollups for a date range.
+        
+        :param start: First day to include.
+        :param end: Last day to include.
+        :return: DailyStat rows, one per (day, project) with any activity.
+        """
+        pass
+
+    @abstractmethod
+    def rebuild_daily_stats(self) -> int:
+        """
+        Recomputes the daily rollups from scratch from all stored tasks,
+        archived ones included. Used to backfill existing history.
+        
+        :return: The number of (day, project) rows written.
+        """
+        pass
+
+    @abstractmethod
+    def get_version(self) -> int:
+        """
+        Retrieves the current change-log version. It moves on every write,
+        so it can key caches of anything rendered from the stored tasks.
+        
+        :return: The latest change-log version (0 if nothing was ever written).
+        """
+        pass
+
+    def get_change_horizon(self) -> int:
+        """
+        Retrieves the oldest version get_changes() can still answer in full.
+        Tombstones at or before it may have been pruned, so a client that
+        synced earlier than this must fetch everything again.
+        
+        :return: The retention horizon (0 while nothing was pruned).
+        """
+        return max(0, self.get_version() - self.change_retention)
+
+    @abstractmethod
+    def get_changes(self, since: int = 0) -> Tuple[int, List[Task], List[int]]:
+        """
+        Retrieves the tasks created, updated or deleted after a change-log version.
+        Deletions are only reported back to get_change_horizon().
+        
+        :param since: The version the client last synced to (0 for everything).
+        :return: A tuple of (current version, changed tasks, ids of deleted tasks).
+        """
+        pass
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+# Fields that hold user text; everything else (ids, views, schedules) is kept as-is
+FREE_TEXT_FIELDS = ("title", "description", "subtask_title", "project")
+# Request headers worth replaying; HX-Current-URL is reduced to its view
+CAPTURED_HEADERS = ("hx-request", "hx-target", "hx-trigger", "hx-current-url")
+_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+# Kept so that structure survives: words, nested projects, hashtags
+_SEPARATORS = set(" /#")
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class Anonymizer:
+    """
+    Replaces text with pseudonyms of the same length and shape. Each output
+    character depends on the salt and the whole input prefix up to it, so
+    prefixes map to prefixes: the keystrokes "wor", "work" stay prefixes of
+    each other, and autocomplete replays match like the originals did.
+    """
+
+    def __init__(self, salt: Optional[bytes] = None):
+        self._salt = salt if salt is not None else os.urandom(16)
+
+    def text(self, value: str) -> str:
+        h = hashlib.blake2s(key=self._salt)
+        out = []
+        for char in value:
+            h.update(char.encode())
+            if char in _SEPARATORS:
+                out.append(char)
+            else:
+                out.append(_LETTERS[h.copy().digest()[0] % len(_LETTERS)])
+        return "".join(out)
+
+    def params(self, params: List[tuple]) -> Dict[str, str]:
+        return {key: self.text(value) if key in FREE_TEXT_FIELDS else value for key, value in params}
+
+
+def route_of(path: str) -> str:
+    """Group paths by route for reporting: /update-task/42 -> /update-task/{id}"""
+    return _ID_SEGMENT.sub("/{id}", path)
+
+
+class TrafficCapture:
+    """
+    ASGI middleware appending one JSON line per HTTP request to `path`:
+    offset from capture start, method, path, route, anonymized query and
+    form fields, HX headers, status, response size and duration. Replay
+    the file with replay_traffic.py.
+    """
+
+    def __init__(self, app, path: str, anonymizer: Optional[Anonymizer] = None):
+        self.app = app
+        self.anonymizer = anonymizer or Anonymizer()
+        self._file = open(path, "a", buffering=1)  # Line-buffered: a crash loses at most one request
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        body = []
+        response = {"status": None, "bytes": 0}
+
+        async def tee_receive():
+            # Record the body as the app reads it, rather than reading it ahead
+            message = await receive()
+            if message["type"] == "http.request":
+                body.append(message.get("body", b""))
+            return message
+
+        async def tee_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, tee_receive, tee_send)
+        finally:
+            self._record(scope, b"".join(body), started, response)
+
+    def _record(self, scope, body: bytes, started: float, response: Dict[str, Any]):
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        entry = {
+            "t": round(started - self._start, 6),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route_of(scope["path"]),
+            "query": self.anonymizer.params(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)),
+            "form": {},
+            "headers": {},
+            "status": response["status"],
+            "bytes": response["bytes"],
+            "duration_ms": round((time.monotonic() - started) * 1000, 3),
+        }
+        if headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+            entry["form"] = self.anonymizer.params(parse_qsl(body.decode("utf-8", "replace"), keep_blank_values=True))
+        for name in CAPTURED_HEADERS:
+            if name in headers:
+                value = headers[name]
+                if name == "hx-current-url":
+                    # Only which view the page showed matters to the handlers
+                    view = dict(parse_qsl(urlsplit(value).query)).get("view")
+                    value = f"http://replay/?view={view}" if view else "http://replay/"
+                entry["headers"][name] = value
+        line = json.dumps(entry, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")